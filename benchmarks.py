@@ -0,0 +1,413 @@
+"""
+Benchmarks of the hot paths: Polynome arithmetic, Moment, center_mass, transform_geom and
+the end-to-end batch job. Results are written as JSON and may be compared with a baseline run:
+
+    python benchmarks.py --output current.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import numpy as np
+
+RES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_resources')
+LAYER_PATH = os.path.join(RES_DIR, 'russia_south_village_3857.shp')
+
+VERTEX_COUNTS = (4, 64, 1000, 100000)
+
+# reference values are integrated with mpmath, they are stored for smaller polygons only
+ACCURACY_VERTEX_COUNTS = (4, 64, 1000)
+ACCURACY_TOLERANCE = 1e-9
+REFERENCE_PATH = os.path.join(RES_DIR, 'accuracy_reference.json')
+REFERENCE_DIGITS = 50
+
+_SEGMENT_MOMENT_TIMER = '''
+import timeit
+from moment import Moment
+number = {number}
+print(timeit.timeit(lambda: Moment.compute_segment_moment(3, 3, 5.0, 0.6, 1.2, 0.8, -0.7, None, None),
+                    number=number) / number)
+'''
+
+
+def bench_contract_overhead(number=2000):
+
+    """
+    Measures cost of one Moment.compute_segment_moment call (two Polynome.binomial_theorem calls)
+    with PyContracts checks (strict mode, former behaviour) and without them.
+    Each mode runs in its own interpreter because contracts are applied at import time.
+    :return: dict with seconds per segment
+    """
+
+    result = {}
+
+    for name, strict in (('strict', '1'), ('default', '0')):
+
+        env = dict(os.environ, CONTOUR_MOMENT_STRICT=strict)
+        out = subprocess.check_output([sys.executable, '-c', _SEGMENT_MOMENT_TIMER.format(number=number)],
+                                      env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        result[name] = float(out)
+
+    result['speedup'] = result['strict'] / result['default']
+
+    return result
+
+
+def synthetic_polygon(vertex_count, seed=0, origin=(4500000.0, 5600000.0), radius=50.0):
+
+    """
+    Random star-shaped polygon around origin, projected coordinates like the bundled layer
+    :param vertex_count: number of distinct vertices, the ring gets one more closing vertex
+    :return: WKB bytes
+    """
+
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertex_count))
+    radii = radius * rng.uniform(0.5, 1.0, vertex_count)
+
+    ring = np.column_stack((origin[0] + radii * np.cos(angles), origin[1] + radii * np.sin(angles)))
+    ring = np.vstack((ring, ring[:1])).astype('<f8')
+
+    return b'\x01' + np.array([3, 1, len(ring)], dtype='<u4').tobytes() + ring.tobytes()
+
+
+def layer_geometries(count, path=LAYER_PATH):
+
+    """
+    :return: list of the first count polygonal geometries of the layer
+    """
+
+    import ogr
+    from gdal_helper import is_polygonal
+
+    ds = ogr.Open(path, 0)
+    geometries = []
+    for feature in ds.GetLayer():
+        if len(geometries) == count:
+            break
+        geom = feature.GetGeometryRef()
+        if is_polygonal(geom):
+            geometries.append(geom.Clone())
+    ds = None
+
+    return geometries
+
+
+def _time(function, repeat):
+
+    """
+    :return: best seconds per call of repeat runs, every run lasts at least 0.2 s
+    """
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_polynome(repeat=5):
+
+    from polynome import Polynome
+
+    a = Polynome.binomial_theorem(x_coef=0.6, y_coef=1.2, power=3)
+    b = Polynome.binomial_theorem(x_coef=0.8, y_coef=-0.7, power=3)
+    product = a * b
+
+    return {'polynome.mul': _time(lambda: a * b, repeat),
+            'polynome.compute_integral_x': _time(lambda: product.compute_integral_x(x_begin=0, x_end=5.0, y_value=1),
+                                                 repeat)}
+
+
+def bench_geometry(name, geom, repeat=5):
+
+    """
+    Times Moment and gdal_helper functions on one geometry, Moment is created on every call
+    because it caches its moment table
+    """
+
+    from moment import Moment
+    from gdal_helper import center_mass, transform_geom
+
+    return {'moment.compute[{}]'.format(name): _time(lambda: Moment(geom).compute(2, 0), repeat),
+            'moment.compute_hu[{}]'.format(name): _time(lambda: Moment(geom).compute_hu(0), repeat),
+            'center_mass[{}]'.format(name): _time(lambda: center_mass(geom), repeat),
+            'transform_geom[{}]'.format(name): _time(lambda: transform_geom(geom, shift=(1.0, 2.0), angle=30, scale=1.5),
+                                                     repeat)}
+
+
+def bench_layer_geometries(geometries, repeat=5):
+
+    """
+    Times Moment, packed centroids and transforms on real footprints, seconds per geometry
+    """
+
+    from moment import Moment
+    from moment_batch import centroids_batch, transform_packed
+    from wkb_reader import pack_wkb_parts
+
+    def compute_all():
+        for geom in geometries:
+            Moment(geom).compute_hu_all()
+
+    packed = pack_wkb_parts([geom.ExportToWkb() for geom in geometries])
+
+    return {'moment.compute_hu_all[layer]': _time(compute_all, repeat) / len(geometries),
+            'centroids_batch[layer]': _time(lambda: centroids_batch(*packed[:3], geom_offsets=packed[3]),
+                                            repeat) / len(geometries),
+            'transform_packed[layer]': _time(lambda: transform_packed(*packed[:3], shift=(1.0, 2.0), angle=30, scale=1.5,
+                                                                      geom_offsets=packed[3]), repeat) / len(geometries)}
+
+
+def bench_pipeline(feature_count=None, path=LAYER_PATH):
+
+    """
+    End-to-end streaming job over the first feature_count features of the layer (all by default)
+    :return: features per second
+    """
+
+    from count_moments_in_shp import LayerQuery, run_streaming
+
+    query = LayerQuery(fid_ranges=[(0, feature_count)]) if feature_count else None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = timeit.default_timer()
+        count = run_streaming(path, os.path.join(tmp_dir, 'moments.shp'), query=query)
+        seconds = timeit.default_timer() - start
+
+    return {'count_moments_in_shp.features_per_second': count / seconds}
+
+
+def _relative_error(values, expected):
+
+    values, expected = np.ravel(values), np.ravel(expected)
+    scale = np.maximum(np.abs(expected), np.finfo(np.float64).tiny)
+
+    return float(np.max(np.abs(values - expected) / scale, initial=0.0))
+
+
+def _reference_moment(segments, p, q, cx, cy):
+
+    import mpmath
+
+    total = mpmath.mpf(0)
+    for (x0, y0), (x1, y1) in segments:
+        x0, y0, dx, dy = x0 - cx, y0 - cy, x1 - x0, y1 - y0
+        total += mpmath.sqrt(dx * dx + dy * dy) * mpmath.fsum(
+            mpmath.binomial(p, a) * mpmath.binomial(q, b) * x0 ** (p - a) * dx ** a * y0 ** (q - b) * dy ** b / (a + b + 1)
+            for a in range(p + 1) for b in range(q + 1))
+    return total
+
+
+def reference_values(wkb):
+
+    """
+    Moments of the polygon integrated with mpmath at REFERENCE_DIGITS digits, independently of the moment engine:
+    central moments are integrated about the centroid directly, hu-moments use the textbook formulas
+    :return: dict of raw and normalized (4, 4) tables and 7 hu-moments as lists of floats
+    """
+
+    import mpmath
+    from wkb_reader import read_wkb
+
+    with mpmath.workdps(REFERENCE_DIGITS):
+
+        segments = [((mpmath.mpf(x0), mpmath.mpf(y0)), (mpmath.mpf(x1), mpmath.mpf(y1)))
+                    for polygon in read_wkb(wkb) for ring in polygon
+                    for (x0, y0), (x1, y1) in zip(ring[:-1].tolist(), ring[1:].tolist()) if (x0, y0) != (x1, y1)]
+
+        raw = [[_reference_moment(segments, p, q, 0, 0) for q in range(4)] for p in range(4)]
+        cx, cy = raw[1][0] / raw[0][0], raw[0][1] / raw[0][0]
+        central = [[_reference_moment(segments, p, q, cx, cy) for q in range(4)] for p in range(4)]
+        n = [[central[p][q] / central[0][0] ** (p + q + 1) for q in range(4)] for p in range(4)]
+
+        s1, s2 = n[3][0] + n[1][2], n[2][1] + n[0][3]
+        d1, d2 = n[3][0] - 3 * n[1][2], 3 * n[2][1] - n[0][3]
+
+        hu = [n[2][0] + n[0][2],
+              (n[2][0] - n[0][2]) ** 2 + 4 * n[1][1] ** 2,
+              d1 ** 2 + d2 ** 2,
+              s1 ** 2 + s2 ** 2,
+              d1 * s1 * (s1 ** 2 - 3 * s2 ** 2) + d2 * s2 * (3 * s1 ** 2 - s2 ** 2),
+              (n[2][0] - n[0][2]) * (s1 ** 2 - s2 ** 2) + 4 * n[1][1] * s1 * s2,
+              d2 * s1 * (s1 ** 2 - 3 * s2 ** 2) - d1 * s2 * (3 * s1 ** 2 - s2 ** 2)]
+
+        return {'raw': [[float(value) for value in row] for row in raw],
+                'normalized': [[float(value) for value in row] for row in n],
+                'hu': [float(value) for value in hu]}
+
+
+def write_reference(path=REFERENCE_PATH, vertex_counts=ACCURACY_VERTEX_COUNTS):
+
+    """
+    Regenerates the stored reference values of the seeded synthetic polygons, needs mpmath
+    """
+
+    reference = {str(count): reference_values(synthetic_polygon(count, seed=count)) for count in vertex_counts}
+
+    with open(path, 'w') as output:
+        json.dump(reference, output, indent=1)
+
+
+def check_accuracy(geometries, path=REFERENCE_PATH):
+
+    """
+    Compares the moment engine with the stored high precision reference values, see reference_values.
+    First order central moments vanish by definition, the engine returns rounding noise for them,
+    they are left out.
+    :param geometries: dict name -> ogr.Geometry, names are keys of the reference file
+    :return: dict name -> max relative difference
+    """
+
+    from moment import Moment
+
+    with open(path) as reference_file:
+        reference = json.load(reference_file)
+
+    powers = np.arange(4)
+    nonzero = powers[:, None] + powers[None, :] != 1
+
+    result = {}
+
+    for name, geom in geometries.items():
+
+        moment = Moment(geom)
+        table, expected = moment.moment_table(3), reference[name]
+
+        result['accuracy[{}]'.format(name)] = max(
+            _relative_error(table.raw, expected['raw']),
+            _relative_error(table.normalized[nonzero], np.asarray(expected['normalized'])[nonzero]),
+            _relative_error(moment.compute_hu_all(), expected['hu']))
+
+    return result
+
+
+def metadata():
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import moment_jit
+
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'commit': commit, 'numba': moment_jit.ENABLED}
+
+
+def run_benchmarks(repeat=5, vertex_counts=VERTEX_COUNTS, layer_features=1000, pipeline_features=None):
+
+    """
+    Runs the whole suite
+    :param layer_features: number of real footprints timed by Moment, 0 skips the layer benchmarks
+    :param pipeline_features: number of features of the end-to-end run, all by default
+    :return: dict of metadata, timings (seconds per call), throughput and accuracy
+    """
+
+    import ogr
+
+    geometries = {str(count): ogr.CreateGeometryFromWkb(synthetic_polygon(count, seed=count)) for count in vertex_counts}
+
+    timings = bench_polynome(repeat)
+    for name, geom in geometries.items():
+        timings.update(bench_geometry(name, geom, repeat))
+
+    throughput = {}
+    if layer_features and os.path.exists(LAYER_PATH):
+        timings.update(bench_layer_geometries(layer_geometries(layer_features), repeat))
+        throughput.update(bench_pipeline(pipeline_features))
+
+    accuracy = check_accuracy({name: geom for name, geom in geometries.items()
+                               if int(name) in ACCURACY_VERTEX_COUNTS})
+
+    return {'metadata': metadata(), 'timings': timings, 'throughput': throughput, 'accuracy': accuracy}
+
+
+def compare(results, baseline, tolerance=0.1):
+
+    """
+    Compares results with a baseline run
+    :param tolerance: allowed relative slowdown
+    :return: list of (name, baseline value, current value) of regressions and failed accuracy checks
+    """
+
+    regressions = []
+
+    for name, seconds in results['timings'].items():
+        reference = baseline.get('timings', {}).get(name)
+        if reference is not None and seconds > reference * (1 + tolerance):
+            regressions.append((name, reference, seconds))
+
+    for name, rate in results['throughput'].items():
+        reference = baseline.get('throughput', {}).get(name)
+        if reference is not None and rate * (1 + tolerance) < reference:
+            regressions.append((name, reference, rate))
+
+    return regressions + accuracy_failures(results)
+
+
+def accuracy_failures(results):
+
+    """
+    Accuracy checks are compared with the stored reference values, so they need no baseline run
+    :return: list of (name, tolerance, error) of failed accuracy checks
+    """
+
+    return [(name, ACCURACY_TOLERANCE, error) for name, error in results['accuracy'].items()
+            if error > ACCURACY_TOLERANCE]
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Runs benchmarks, optionally compares them with a baseline')
+    parser.add_argument('--output', help='JSON file of the results')
+    parser.add_argument('--baseline', help='JSON file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative slowdown')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--layer-features', type=int, default=1000,
+                        help='number of real footprints timed by Moment, 0 skips the bundled layer')
+    parser.add_argument('--pipeline-features', type=int, help='number of features of the end-to-end run')
+    parser.add_argument('--contracts', action='store_true', help='measure PyContracts overhead as well')
+    parser.add_argument('--write-reference', action='store_true',
+                        help='regenerate reference values of the accuracy check with mpmath and exit')
+    args = parser.parse_args(argv)
+
+    if args.write_reference:
+        write_reference()
+        return 0
+
+    results = run_benchmarks(args.repeat, layer_features=args.layer_features, pipeline_features=args.pipeline_features)
+
+    if args.contracts:
+        results['contracts'] = bench_contract_overhead()
+
+    for name, seconds in results['timings'].items():
+        print('{:<40} {:>12.2f} us'.format(name, seconds * 1e6))
+    for name, rate in results['throughput'].items():
+        print('{:<40} {:>12.0f} /s'.format(name, rate))
+    for name, error in results['accuracy'].items():
+        print('{:<40} {:>12.2e}'.format(name, error))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+    else:
+        regressions = accuracy_failures(results)
+
+    for name, reference, current in regressions:
+        print('REGRESSION {}: reference {:.4g}, current {:.4g}'.format(name, reference, current))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
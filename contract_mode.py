@@ -0,0 +1,18 @@
+import os
+from contracts import contract
+
+# full PyContracts checks of internal hot paths, enabled with CONTOUR_MOMENT_STRICT=1
+STRICT = os.environ.get('CONTOUR_MOMENT_STRICT', '0') not in ('', '0')
+
+
+def strict_contract(function):
+
+    """
+    Applies @contract only in strict mode, otherwise returns the function untouched,
+    so internal per-segment calls do not pay for argument checking
+    """
+
+    if STRICT:
+        return contract(function)
+
+    return function
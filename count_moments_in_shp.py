@@ -1,94 +1,455 @@
-from moment import Moment
+from moment_batch import compute_perimeter_hu_batch
+from moment_shared import compute_shared
+from moment_cache import MomentCache
+from moment_writers import open_writer, write_valid
+from job_stats import JobStats, NULL_STATS
+from wkb_reader import pack_wkb, vertex_count
+from gdal_helper import is_polygonal
+import argparse
+import itertools
+import numpy as np
 import ogr
-import os
 from multiprocessing import Pool
-from collections import namedtuple
+from collections import Counter, namedtuple
 
-field_list = ['geom', 'p', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6', 'm7']
-feature_tuple = namedtuple('feature_tuple', ','.join(field_list))
+DEFAULT_CHUNK_SIZE = 4096
 
+# selection of features, every part is pushed down to the OGR driver:
+# layer_name - layer of a multi-layer datasource, the first layer by default
+# where      - OGR SQL attribute filter
+# bbox       - (min_x, min_y, max_x, max_y) spatial filter
+# fid_ranges - list of half-open (start, stop) FID ranges
+LayerQuery = namedtuple('LayerQuery', 'layer_name,where,bbox,fid_ranges')
+LayerQuery.__new__.__defaults__ = (None, None, None, None)
 
-def save_features_to_file(output_path, features):
-    outDriver = ogr.GetDriverByName("ESRI Shapefile")
-    if os.path.exists(output_path):
-        outDriver.DeleteDataSource(output_path)
 
-    outDataSource = outDriver.CreateDataSource(output_path)
-    out_lyr_name = os.path.splitext(os.path.split(output_path)[1])[0]
-    outLayer = outDataSource.CreateLayer(out_lyr_name, geom_type=ogr.wkbPolygon)
-    for each in field_list:
-        fieldDefn = ogr.FieldDefn(each, ogr.OFTReal)
-        outLayer.CreateField(fieldDefn)
+def attribute_filter(query):
+    """
+    Joins the attribute filter and the FID ranges of the query into one OGR SQL expression
+    :return: str or None
+    """
+    clauses = []
+    if query.where:
+        clauses.append('({})'.format(query.where))
+    if query.fid_ranges:
+        clauses.append('({})'.format(' OR '.join('(FID >= {} AND FID < {})'.format(int(start), int(stop))
+                                                 for start, stop in query.fid_ranges)))
+    return ' AND '.join(clauses) or None
+
+
+def open_layer(input_path, query=None):
+    """
+    Opens the datasource once and pushes filters of the query down to the driver,
+    attribute fields are not decoded unless the filter needs them
+    :param query: LayerQuery
+    :return: datasource, layer - the datasource must outlive the layer
+    """
+    query = query or LayerQuery()
+
+    ds = ogr.Open(input_path, 0)
+    if ds is None:
+        raise IOError('Can not open {}'.format(input_path))
+
+    layer = ds.GetLayerByName(query.layer_name) if query.layer_name else ds.GetLayer()
+    if layer is None:
+        raise ValueError('Layer {} not found in {}'.format(query.layer_name, input_path))
+
+    if not _set_filters(layer, query):
+        defn = layer.GetLayerDefn()
+        layer.SetIgnoredFields([defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())])
+
+    return ds, layer
+
+
+def _set_filters(layer, query):
+    """
+    Sets attribute filter, FID ranges and bbox of the query on the layer
+    :return: True if an attribute filter is set
+    """
+    where = attribute_filter(query)
+    if where and layer.SetAttributeFilter(where) != 0:
+        raise ValueError('Invalid attribute filter {}'.format(where))
+
+    if query.bbox:
+        layer.SetSpatialFilterRect(*query.bbox)
+
+    return bool(where)
+
+
+def is_filtered(query):
+    """
+    Checks that the query selects a subset of features of the layer
+    :rtype: bool
+    """
+    return query is not None and bool(attribute_filter(query) or query.bbox)
+
+
+def index_ranges(input_path, block_size, query=None):
+    """
+    Splits features of the unfiltered layer into ranges of block_size feature indexes,
+    the last range is open-ended
+    :return: list of (start, stop), stop of the last range is None
+    """
+    query = query or LayerQuery()
+
+    ds, layer = open_layer(input_path, LayerQuery(query.layer_name))
+    feature_count = layer.GetFeatureCount()
+    layer = None
+    ds = None
+
+    starts = list(range(0, max(feature_count, 1), block_size))
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def iter_index_range(input_path, query, start, stop=None):
+    """
+    Reads features [start, stop) of the unfiltered layer, stop None reads to the end.
+    SetNextByIndex of an unfiltered layer seeks (Shapefile reads records by offset), while FID range
+    and other filters make drivers scan the whole layer, so filters of the query are applied
+    to the features of the range only, in a Memory layer
+    :return: generator of ogr.Feature
+    """
+    query = query or LayerQuery()
+
+    ds, layer = open_layer(input_path, LayerQuery(query.layer_name))
+    if query.where:
+        # the attribute filter needs the fields
+        layer.SetIgnoredFields([])
+
+    layer.SetNextByIndex(start)
+    indexes = itertools.count(start) if stop is None else range(start, stop)
+
+    if not is_filtered(query):
+        for _ in indexes:
+            feature = layer.GetNextFeature()
+            if feature is None:
+                break
+            yield feature
+        return
+
+    block_ds = ogr.GetDriverByName('Memory').CreateDataSource('block')
+    block = block_ds.CreateLayer('block', layer.GetSpatialRef(), ogr.wkbUnknown)
+    defn = layer.GetLayerDefn()
+    for i in range(defn.GetFieldCount()):
+        block.CreateField(defn.GetFieldDefn(i))
+
+    for _ in indexes:
+        feature = layer.GetNextFeature()
+        if feature is None:
+            break
+        copy = ogr.Feature(block.GetLayerDefn())
+        copy.SetFrom(feature)
+        copy.SetFID(feature.GetFID())
+        block.CreateFeature(copy)
+
+    _set_filters(block, query)
+    block.ResetReading()
+    for feature in block:
+        yield feature
+
+
+def skip_reason(geom):
+    """
+    Failure reason of a feature skipped because its geometry is not polygonal
+    """
+    return 'no_geometry' if geom is None else 'not_polygonal'
+
+
+def iter_feature_chunks(layer, chunk_size=DEFAULT_CHUNK_SIZE, stats=NULL_STATS):
+    """
+    Reads polygons and multipolygons of the layer (or any iterable of features) by chunks,
+    only one chunk of geometries is kept in memory
+    :param stats: JobStats, skipped features are counted as failures
+    :return: generator of (fids, list of ogr.Geometry)
+    """
+    fids = []
+    chunk = []
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        if not is_polygonal(geom):
+            stats.fail(skip_reason(geom))
+            continue
+        fids.append(feature.GetFID())
+        chunk.append(geom.Clone())
+        if len(chunk) == chunk_size:
+            yield np.array(fids, dtype=np.int64), chunk
+            fids = []
+            chunk = []
+    if chunk:
+        yield np.array(fids, dtype=np.int64), chunk
+
+
+def iter_geometry_chunks(layer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :return: generator of lists of ogr.Geometry, see iter_feature_chunks
+    """
+    for _, chunk in iter_feature_chunks(layer, chunk_size):
+        yield chunk
+
+
+def _compute_wkbs(wkbs, stats):
+    with stats.stage('decode'):
+        packed = pack_wkb(wkbs)
+    with stats.stage('compute'):
+        return compute_perimeter_hu_batch(*packed)
+
+
+def compute_chunk(geometries, cache=None, stats=NULL_STATS):
+    """
+    Computes perimeter and hu-moments of every geometry of the chunk in one batch
+    :param cache: optional MomentCache, only geometries missing in the cache are computed
+    :param stats: JobStats, export and unpacking of WKB is timed as decode stage,
+                  vertices of all geometries are counted, cached ones included
+    :return: (N, 8) array, rows of degenerate geometries are NaN
+    """
+    with stats.stage('decode'):
+        wkbs = [bytes(geom.ExportToWkb()) for geom in geometries]
+        stats.count('vertices', vertex_count(wkbs))
+    if cache is None:
+        return _compute_wkbs(wkbs, stats)
+    return cache.compute(wkbs, lambda missing: _compute_wkbs(missing, stats))
+
+
+def _write_chunk(writer, fids, geometries, result, stats):
+    """
+    Writes valid rows of the chunk, rows of degenerate geometries are counted as failures
+    :return: number of written features
+    """
+    with stats.stage('write'):
+        count = write_valid(writer, fids, geometries, result)
+    stats.count('features', count)
+    stats.fail('degenerate', len(fids) - count)
+    stats.progress()
+    return count
+
+
+def run_streaming(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, cache=None, query=None, stats=NULL_STATS):
+    """
+    Computes moments of the whole layer chunk by chunk and writes them to output_path incrementally,
+    peak memory depends on chunk_size only
+    :param output_path: format is chosen by extension, see moment_writers.open_writer
+    :param cache: optional MomentCache, reruns compute moments of new and changed geometries only
+    :param query: optional LayerQuery
+    :param stats: JobStats of read, decode, compute and write stages
+    :return: number of written features
+    """
+    inDataSource, inLayer = open_layer(input_path, query)
+    writer = open_writer(output_path)
+    chunks = iter_feature_chunks(inLayer, chunk_size, stats)
 
     count = 0
-    for feature in features:
-        outFeature = ogr.Feature(outLayer.GetLayerDefn())
-        outFeature.SetGeometry(feature.geom)
-        for i, item in enumerate(field_list[1:-1:]):
-            outFeature.SetField(item, feature[i+1])
-        outLayer.CreateFeature(outFeature)
-        count+=1
-        # print (count)
-        outFeature = None
-    outDataSource = None
-
-def executor(geom):
     try:
-        m = Moment(geom)
-        mm = m.compute(0, 0, central=True)
-    except Exception:
-        print(geom)
-        return None
-    else:
-        sum = 0
-        arr = []
-        for i in range(0, 7):
-            hu = m.compute_hu(i, scale_inv=True)
-            arr.append(hu)
-            sum += hu**2
-        return (geom, mm, *arr)
+        while True:
+            with stats.stage('read'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            fids, geometries = chunk
+            count += _write_chunk(writer, fids, geometries, compute_chunk(geometries, cache, stats), stats)
+    finally:
+        with stats.stage('write'):
+            writer.close()
 
-def helper(args):
-    a = executor(args[0])
-    return a
+    inDataSource = None
+    return count
 
 
-if __name__ == '__main__':
-    res_dir = os.path.join(os.path.dirname(__file__), 'test_resources')
-    inShapefile = os.path.join(res_dir, 'russia_south_village_3857.shp')
-    inDriver = ogr.GetDriverByName("ESRI Shapefile")
-    inDataSource = inDriver.Open(inShapefile, 0)
-    inLayer = inDataSource.GetLayer()
+def _compute_range(args):
+    """
+    Worker of run_parallel: opens the datasource itself and computes moments of the features
+    of the query among features [start, stop) of the layer, see iter_index_range
+    :return: fids, WKB of geometries, (N, 8) array of results, number of vertices,
+             dict of skipped features by reason
+    """
+    input_path, query, start, stop = args
 
-    output_path = os.path.join(os.path.split(inShapefile)[0], "moments.shp")
+    fids = []
+    wkbs = []
+    skipped = Counter()
+    for feature in iter_index_range(input_path, query, start, stop):
+        geom = feature.GetGeometryRef()
+        if not is_polygonal(geom):
+            skipped[skip_reason(geom)] += 1
+            continue
+        fids.append(feature.GetFID())
+        wkbs.append(bytes(geom.ExportToWkb()))
 
-    ds = inDriver.Open(inShapefile, 0)
+    packed = pack_wkb(wkbs)
+    result = compute_perimeter_hu_batch(*packed)
+    return np.array(fids, dtype=np.int64), wkbs, result, len(packed[0]), dict(skipped)
 
-    lay = ds.GetLayer()
-    geometries = []
 
-    inLayerDefn = lay.GetLayerDefn()
-    executor_args =[]
+def run_parallel(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, query=None, stats=NULL_STATS):
+    """
+    Splits the layer into ranges of chunk_size features, every worker process reads its range
+    from input_path, only WKB and result arrays are sent back
+    :param workers: number of processes, os.cpu_count() by default
+    :param query: optional LayerQuery, ranges are counted over all features of the layer,
+                  filters are applied inside of every range, see iter_index_range
+    :param stats: JobStats, read, decode and compute run in workers, the parent process
+                  records the time it waits for them as workers stage
+    :return: number of written features
+    """
+    ranges = [(input_path, query, start, stop) for start, stop in index_ranges(input_path, chunk_size, query)]
+
+    writer = open_writer(output_path)
+
     count = 0
-    for feature in lay:
-        try:
-            ingeom = feature.GetGeometryRef().Clone()
-        except:
-            pass
-        else:
-            executor_args.append((ingeom, ))
-            count += 1
-        if count> 10:
+    try:
+        with Pool(workers) as pool:
+            results = pool.imap(_compute_range, ranges)
+            while True:
+                with stats.stage('workers'):
+                    chunk = next(results, None)
+                if chunk is None:
+                    break
+                fids, wkbs, result, vertices, skipped = chunk
+                stats.count('vertices', vertices)
+                for reason, value in skipped.items():
+                    stats.fail(reason, value)
+                with stats.stage('decode'):
+                    geometries = [ogr.CreateGeometryFromWkb(wkb) for wkb in wkbs]
+                count += _write_chunk(writer, fids, geometries, result, stats)
+    finally:
+        with stats.stage('write'):
+            writer.close()
+
+    return count
+
+
+def read_layer_packed(layer, stats=NULL_STATS):
+    """
+    Decodes polygons of the layer into one packed coordinate buffer
+    :param stats: JobStats, skipped features are counted as failures
+    :return: fids, coords, ring_offsets, poly_offsets
+    """
+    fids = []
+    wkbs = []
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        if not is_polygonal(geom):
+            stats.fail(skip_reason(geom))
+            continue
+        fids.append(feature.GetFID())
+        wkbs.append(geom.ExportToWkb())
+    return (np.array(fids, dtype=np.int64), *pack_wkb(wkbs))
+
+
+def _geometry_blocks(layer, fids, chunk_size):
+    """
+    Second pass over the layer, collects geometries of fids by blocks of chunk_size
+    :return: generator of (start, stop, list of ogr.Geometry)
+    """
+    layer.ResetReading()
+    start = 0
+    geometries = []
+    for feature in layer:
+        k = start + len(geometries)
+        if k == len(fids):
             break
+        if feature.GetFID() != fids[k]:
+            continue
+        geometries.append(feature.GetGeometryRef().Clone())
+        if len(geometries) == chunk_size:
+            yield start, k + 1, geometries
+            start = k + 1
+            geometries = []
+    if geometries:
+        yield start, start + len(geometries), geometries
+
+
+def run_shared_memory(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, query=None,
+                      stats=NULL_STATS):
+    """
+    Decodes the layer into a packed buffer in shared memory, workers compute moments on zero-copy views
+    and write into a shared result matrix
+    :param query: optional LayerQuery
+    :param stats: JobStats, reading the layer into the packed buffer is timed as read stage
+    :return: number of written features
+    """
+    inDataSource, inLayer = open_layer(input_path, query)
+
+    with stats.stage('read'):
+        fids, coords, ring_offsets, poly_offsets = read_layer_packed(inLayer, stats)
+    stats.count('vertices', len(coords))
+
+    with stats.stage('compute'):
+        result = compute_shared(coords, ring_offsets, poly_offsets, workers=workers, chunk_size=chunk_size)
+
+    writer = open_writer(output_path)
+
+    count = 0
+    try:
+        for start, stop, geometries in _geometry_blocks(inLayer, fids, chunk_size):
+            count += _write_chunk(writer, fids[start:stop], geometries, result[start:stop], stats)
+    finally:
+        with stats.stage('write'):
+            writer.close()
 
-    features = []
-    pool = Pool(8)
-    res = pool.map(helper, executor_args)
-    pool.close()
-    pool.join()
-    for each in res:
-        if each is not None:
-            features.append(feature_tuple(*each))
-    save_features_to_file(output_path, features)
     inDataSource = None
-    print('end')
\ No newline at end of file
+    return count
+
+
+def parse_fid_range(value):
+    """
+    Parses START:STOP (half-open) or a single FID
+    """
+    start, _, stop = value.partition(':')
+    try:
+        start = int(start)
+        stop = int(stop) if stop else start + 1
+    except ValueError:
+        raise argparse.ArgumentTypeError('FID range must be START:STOP or FID, got {}'.format(value))
+    if stop <= start:
+        raise argparse.ArgumentTypeError('Empty FID range {}'.format(value))
+    return start, stop
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Computes perimeter and hu-moments of polygons of a vector layer')
+    parser.add_argument('input', help='input OGR datasource')
+    parser.add_argument('output', help='output file: .shp, .gpkg, .parquet, .arrow or .npy')
+    parser.add_argument('--layer', help='layer name, the first layer by default')
+    parser.add_argument('--where', help='OGR SQL attribute filter, e.g. "population > 100"')
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MIN_X', 'MIN_Y', 'MAX_X', 'MAX_Y'),
+                        help='spatial filter rectangle in layer coordinates')
+    parser.add_argument('--fids', type=parse_fid_range, action='append', metavar='START:STOP',
+                        help='half-open FID range, may be repeated')
+    parser.add_argument('--mode', choices=('streaming', 'parallel', 'shared'), default='streaming')
+    parser.add_argument('--workers', type=int, help='number of processes, all CPUs by default')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--cache', help='SQLite file of cached results, streaming mode only')
+    parser.add_argument('--progress', type=float, metavar='SECONDS', help='print progress every SECONDS')
+    parser.add_argument('--stats', metavar='PATH', help='write JSON summary of stage times and counters')
+    args = parser.parse_args(argv)
+    if args.cache and args.mode != 'streaming':
+        parser.error('--cache is supported in streaming mode only')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    query = LayerQuery(args.layer, args.where, args.bbox, args.fids)
+    stats = JobStats(args.progress) if args.stats or args.progress else NULL_STATS
+
+    if args.mode == 'parallel':
+        count = run_parallel(args.input, args.output, args.workers, args.chunk_size, query=query, stats=stats)
+    elif args.mode == 'shared':
+        count = run_shared_memory(args.input, args.output, args.workers, args.chunk_size, query=query, stats=stats)
+    elif args.cache:
+        with MomentCache(args.cache) as cache:
+            count = run_streaming(args.input, args.output, args.chunk_size, cache=cache, query=query, stats=stats)
+            print('cache hits: {0.hits}, misses: {0.misses}, evictions: {0.evictions}'.format(cache.stats))
+            stats.count('cache_hits', cache.hits)
+            stats.count('cache_misses', cache.misses)
+    else:
+        count = run_streaming(args.input, args.output, args.chunk_size, query=query, stats=stats)
+
+    print('{} features written to {}'.format(count, args.output))
+    if args.stats:
+        stats.write_summary(args.stats)
+    return count
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,231 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import ogr
+from moment_cache import MomentCache
+from job_stats import JobStats
+from gdal_helper import transform_geom
+from moment import Moment
+from moment_writers import RESULT_FIELDS
+from count_moments_in_shp import compute_chunk, iter_geometry_chunks, run_streaming, run_parallel, \
+    run_shared_memory, LayerQuery, attribute_filter, index_ranges, iter_index_range, \
+    parse_fid_range, parse_args, main
+
+
+class CountMomentsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        wkts = ['POLYGON((-2 -2, 2 -2, 2 2, -2 2, -2 -2), (-1 -1, 1 -1, 1 1, -1 1, -1 -1))',
+                'POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))']
+
+        self.geometries = [ogr.CreateGeometryFromWkt(wkt) for wkt in wkts]
+        self.geometries.append(transform_geom(self.geometries[1], shift=(3.5, -1.2), angle=17, scale=1.3))
+
+    def test_compute_chunk(self):
+
+        result = compute_chunk(self.geometries)
+
+        self.assertEqual(result.shape, (len(self.geometries), 8))
+
+        for k, geom in enumerate(self.geometries):
+
+            m = Moment(geom)
+            reference = (m.compute(0, 0, central=True),) + m.compute_hu_all(scale_inv=True)
+
+            for n in range(8):
+
+                with self.subTest(k=k, n=n):
+                    self.assertAlmostEqual(result[k, n], reference[n], delta=1e-9 * abs(reference[n]) + 1e-15)
+
+    def test_compute_chunk_cached(self):
+
+        with MomentCache(':memory:') as cache:
+
+            first = compute_chunk(self.geometries, cache)
+            second = compute_chunk(self.geometries, cache)
+
+            self.assertEqual((cache.hits, cache.misses), (len(self.geometries), len(self.geometries)))
+
+        np.testing.assert_array_equal(first, compute_chunk(self.geometries))
+        np.testing.assert_array_equal(second, first)
+
+    def test_iter_geometry_chunks(self):
+
+        ds = ogr.GetDriverByName('Memory').CreateDataSource('chunks')
+        lay = ds.CreateLayer('chunks', geom_type=ogr.wkbPolygon)
+
+        for i in range(7):
+            feature = ogr.Feature(lay.GetLayerDefn())
+            feature.SetGeometry(self.geometries[i % len(self.geometries)])
+            lay.CreateFeature(feature)
+
+        chunks = list(iter_geometry_chunks(lay, chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+
+    def _write_input(self, path, count):
+
+        driver = ogr.GetDriverByName('ESRI Shapefile')
+        ds = driver.CreateDataSource(path)
+        lay = ds.CreateLayer('input', geom_type=ogr.wkbPolygon)
+
+        for i in range(count):
+            feature = ogr.Feature(lay.GetLayerDefn())
+            feature.SetGeometry(transform_geom(self.geometries[i % len(self.geometries)], shift=(i, 2 * i), angle=i))
+            lay.CreateFeature(feature)
+
+        ds = None
+
+    @staticmethod
+    def _read_output(path):
+
+        ds = ogr.Open(path, 0)
+        rows = [[feature.GetField(name) for name in RESULT_FIELDS] for feature in ds.GetLayer()]
+        ds = None
+        return rows
+
+    def test_parallel_same_as_streaming(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            input_path = os.path.join(tmp_dir, 'input.shp')
+            self._write_input(input_path, 25)
+
+            streaming_path = os.path.join(tmp_dir, 'streaming.shp')
+            parallel_path = os.path.join(tmp_dir, 'parallel.shp')
+            shared_path = os.path.join(tmp_dir, 'shared.shp')
+
+            self.assertEqual(run_streaming(input_path, streaming_path, chunk_size=4), 25)
+            self.assertEqual(run_parallel(input_path, parallel_path, workers=2, chunk_size=4), 25)
+            self.assertEqual(run_shared_memory(input_path, shared_path, workers=2, chunk_size=4), 25)
+
+            self.assertEqual(self._read_output(streaming_path), self._read_output(parallel_path))
+            self.assertEqual(self._read_output(streaming_path), self._read_output(shared_path))
+
+    def test_output_formats(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            input_path = os.path.join(tmp_dir, 'input.shp')
+            self._write_input(input_path, 10)
+
+            shp_path = os.path.join(tmp_dir, 'result.shp')
+            gpkg_path = os.path.join(tmp_dir, 'result.gpkg')
+            npy_path = os.path.join(tmp_dir, 'result.npy')
+
+            for path in (shp_path, gpkg_path, npy_path):
+                self.assertEqual(run_streaming(input_path, path, chunk_size=4), 10)
+
+            rows = self._read_output(shp_path)
+
+            self.assertEqual(self._read_output(gpkg_path), rows)
+            self.assertEqual(np.load(npy_path)[:, 1:].tolist(), rows)
+            self.assertEqual(np.load(npy_path)[:, 0].tolist(), list(range(10)))
+
+    def test_stats(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            input_path = os.path.join(tmp_dir, 'input.shp')
+            self._write_input(input_path, 10)
+
+            ds = ogr.Open(input_path, 1)
+            lay = ds.GetLayer()
+            for wkt in ('POLYGON((0 0, 0 0, 0 0, 0 0))', None):
+                feature = ogr.Feature(lay.GetLayerDefn())
+                if wkt:
+                    feature.SetGeometry(ogr.CreateGeometryFromWkt(wkt))
+                lay.CreateFeature(feature)
+            ds = None
+
+            stats = JobStats()
+            run_streaming(input_path, os.path.join(tmp_dir, 'result.npy'), chunk_size=4, stats=stats)
+            summary = stats.summary()
+
+            # failure summary does not depend on the run mode
+            for run in (run_parallel, run_shared_memory):
+                mode_stats = JobStats()
+                run(input_path, os.path.join(tmp_dir, 'result.npy'), workers=2, chunk_size=4, stats=mode_stats)
+                with self.subTest(run=run.__name__):
+                    self.assertEqual(mode_stats.summary()['failures'], {'degenerate': 1, 'no_geometry': 1})
+                    self.assertEqual(mode_stats.summary()['features'], 10)
+                    self.assertEqual(mode_stats.summary()['vertices'], summary['vertices'])
+
+            # cached geometries are counted too
+            with MomentCache(os.path.join(tmp_dir, 'cache.sqlite')) as cache:
+                for _ in range(2):
+                    cache_stats = JobStats()
+                    run_streaming(input_path, os.path.join(tmp_dir, 'result.npy'), chunk_size=4, cache=cache,
+                                  stats=cache_stats)
+                    self.assertEqual(cache_stats.summary()['vertices'], summary['vertices'])
+
+        self.assertEqual(summary['features'], 10)
+        self.assertEqual(summary['failures'], {'degenerate': 1, 'no_geometry': 1})
+        self.assertEqual(set(summary['stages']), {'read', 'decode', 'compute', 'write'})
+        self.assertEqual(summary['stages']['compute']['calls'], 3)
+
+    def test_attribute_filter(self):
+
+        self.assertIsNone(attribute_filter(LayerQuery()))
+        self.assertEqual(attribute_filter(LayerQuery(where='a > 1', fid_ranges=[(0, 5), (10, 11)])),
+                         '(a > 1) AND ((FID >= 0 AND FID < 5) OR (FID >= 10 AND FID < 11))')
+
+        self.assertEqual(parse_fid_range('3:8'), (3, 8))
+        self.assertEqual(parse_fid_range('4'), (4, 5))
+
+    def test_cache_mode(self):
+
+        self.assertEqual(parse_args(['in.shp', 'out.npy', '--cache', 'cache.sqlite']).cache, 'cache.sqlite')
+
+        for mode in ('parallel', 'shared'):
+            with self.subTest(mode=mode), self.assertRaises(SystemExit):
+                parse_args(['in.shp', 'out.npy', '--mode', mode, '--cache', 'cache.sqlite'])
+
+    def test_query(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            input_path = os.path.join(tmp_dir, 'input.shp')
+            self._write_input(input_path, 20)
+
+            ds = ogr.Open(input_path, 1)
+            lay = ds.GetLayer()
+            lay.CreateField(ogr.FieldDefn('n', ogr.OFTInteger))
+            for feature in lay:
+                feature.SetField('n', feature.GetFID() % 2)
+                lay.SetFeature(feature)
+            ds = None
+
+            output_path = os.path.join(tmp_dir, 'result.npy')
+
+            def fids(query):
+                run_streaming(input_path, output_path, chunk_size=3, query=query)
+                return np.load(output_path)[:, 0].astype(int).tolist()
+
+            self.assertEqual(fids(LayerQuery(where='n = 1')), list(range(1, 20, 2)))
+            self.assertEqual(fids(LayerQuery(fid_ranges=[(2, 5), (17, 30)])), [2, 3, 4, 17, 18, 19])
+            self.assertEqual(fids(LayerQuery(where='n = 0', fid_ranges=[(2, 7)])), [2, 4, 6])
+            self.assertEqual(fids(LayerQuery(bbox=(-100, -100, 3, 5))), [0, 1, 3])
+
+            self.assertEqual(index_ranges(input_path, 8), [(0, 8), (8, 16), (16, None)])
+            self.assertEqual([feature.GetFID() for feature in
+                              iter_index_range(input_path, LayerQuery(where='n = 1', fid_ranges=[(2, 30)]), 0, 8)],
+                             [3, 5, 7])
+            self.assertEqual([feature.GetFID() for feature in iter_index_range(input_path, None, 16)], [16, 17, 18, 19])
+
+            self.assertEqual(run_parallel(input_path, output_path, workers=2, chunk_size=3,
+                                          query=LayerQuery(where='n = 1')), 10)
+            self.assertEqual(np.load(output_path)[:, 0].astype(int).tolist(), list(range(1, 20, 2)))
+
+            self.assertEqual(main([input_path, output_path, '--where', 'n = 1', '--fids', '0:6', '--mode', 'parallel',
+                                   '--workers', '2', '--chunk-size', '2']), 3)
+
+            with self.assertRaises(ValueError):
+                run_streaming(input_path, output_path, query=LayerQuery(layer_name='missing'))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
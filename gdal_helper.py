@@ -1,7 +1,9 @@
 import math
+import numpy as np
 import ogr
 from contracts import contract
-from shapely import wkb, affinity
+from moment_batch import centroids_batch, transform_packed
+from wkb_reader import read_wkb, pack_wkb_parts
 
 
 class Vec2:
@@ -10,6 +12,8 @@ class Vec2:
     Class for simple 2d operations
     """
 
+    __slots__ = ('x', 'y')
+
     def __init__(self, point):
 
         self.x = point[0]
@@ -55,7 +59,9 @@ class Vec2:
 def transform_geom(geom, shift=None, angle=None, scale=None):
 
     """ Comfort transformation of GDAL geometry
-    :param geom: ogr.Geometry
+    Translation by shift, then rotation by angle and scaling about the center of mass
+    of the translated geometry, all applied as one affine matrix to the WKB coordinates
+    :param geom: ogr.Geometry(Polygon|MultiPolygon)
     :type geom: *
     :type shift: tuple(float|int, float|int)|None
     :param angle: degrees
@@ -65,78 +71,103 @@ def transform_geom(geom, shift=None, angle=None, scale=None):
     :type: geom: *
     """
 
-    g = wkb.loads(geom.ExportToWkb())
-
-    if shift:
+    return transform_geoms([geom], shift=shift, angle=angle, scale=scale)[0]
 
-        g = affinity.translate(g, shift[0], shift[1])
 
-    if angle:
-        cm = center_mass(ogr.CreateGeometryFromWkb(g.wkb))
-        g = affinity.rotate(g, angle, origin=cm)
+def transform_geoms(geometries, shift=None, angle=None, scale=None):
 
-    if scale:
+    """
+    Batch variant of transform_geom, coordinates of all geometries are transformed by one vectorized call.
+    Parameters are shared by all geometries or given per geometry: (G, 2) shifts, (G,) angles and scales.
+    Z and M values are kept as is.
+    :param geometries: list of ogr.Geometry(Polygon|MultiPolygon)
+    :return: list of new ogr.Geometry
+    """
 
-        cm = center_mass(ogr.CreateGeometryFromWkb(g.wkb))
-        g = affinity.scale(g, scale, scale, scale, origin=cm)
+    if not all(is_polygonal(geom) for geom in geometries):
+        raise TypeError('Input geometry must have polygon or multipolygon type')
 
-    return ogr.CreateGeometryFromWkb(g.wkb)
+    wkbs = [bytearray(geom.ExportToWkb()) for geom in geometries]
+    coords, ring_offsets, poly_offsets, geom_offsets = pack_wkb_parts(wkbs)
 
+    coords = transform_packed(coords, ring_offsets, poly_offsets, shift=shift, angle=angle, scale=scale,
+                              geom_offsets=geom_offsets, out=coords)
 
-def _center_mass_ring(ring):
+    # rings returned by read_wkb are views of the buffer, so the coordinates are written straight into the WKB
+    start = 0
+    for data in wkbs:
+        for polygon in read_wkb(data):
+            for ring in polygon:
+                ring[:] = coords[start:start + len(ring)]
+                start += len(ring)
 
-    center = Vec2((0, 0))
-    perimeter = 0.0
+    return [ogr.CreateGeometryFromWkb(bytes(data)) for data in wkbs]
 
-    for i in range(ring.GetPointCount() - 1):
 
-        p = Vec2(ring.GetPoint(i + 1)) + Vec2(ring.GetPoint(i))
+def ring_points(ring):
 
-        l = (Vec2(ring.GetPoint(i + 1)) - Vec2(ring.GetPoint(i))).length()
+    """
+    Returns vertices of the ring as (N, 2) float64 array, z coordinate is dropped
+    :param ring: ogr.Geometry(LinearRing)
+    :rtype: numpy.ndarray
+    """
 
-        perimeter += l
+    points = ring.GetPoints()
 
-        center += p * 0.5 * l
+    if not points:
+        return np.empty((0, 2))
 
-    return center * (1.0 / perimeter), perimeter
+    return np.array(points, dtype=np.float64)[:, :2]
 
 
-@contract
-def center_mass(geom):
+def is_polygonal(geom):
 
     """
-    Finds center of the given ogr.Geometry(Polygon)
-    :param geom: instance of ogr.Geometry(Polygon)
-    :type geom: *
-    :rtype tuple(float, float)
+    Checks that geometry is a Polygon or a MultiPolygon, 2.5D variants included
+    :param geom: ogr.Geometry or None
+    :rtype: bool
     """
 
-    if geom.GetGeometryType() != ogr.wkbPolygon:
-        raise TypeError('Input geometry must have polygon type')
+    return geom is not None and ogr.GT_Flatten(geom.GetGeometryType()) in (ogr.wkbPolygon, ogr.wkbMultiPolygon)
 
-    i = 0
 
-    center = Vec2((0, 0))
-    mass = 0
+def geometry_rings(geom):
 
-    while True:
+    """
+    Returns rings of the polygon as list of (N, 2) float64 arrays,
+    rings of all parts of a multipolygon are joined into one list
+    :param geom: ogr.Geometry(Polygon|MultiPolygon)
+    :rtype: list
+    """
 
-        ring = geom.GetGeometryRef(i)
+    if ogr.GT_Flatten(geom.GetGeometryType()) == ogr.wkbMultiPolygon:
+        return [ring for i in range(geom.GetGeometryCount()) for ring in geometry_rings(geom.GetGeometryRef(i))]
 
-        if not ring:
-            break
+    return [ring_points(geom.GetGeometryRef(i)) for i in range(geom.GetGeometryCount())]
 
-        ring_center, ring_perimeter = _center_mass_ring(ring)
 
-        center += ring_center * ring_perimeter
+@contract
+def center_mass(geom, weight='perimeter'):
+
+    """
+    Finds center of the given ogr.Geometry(Polygon|MultiPolygon), parts of a multipolygon are merged
+    :param geom: instance of ogr.Geometry(Polygon|MultiPolygon)
+    :type geom: *
+    :param weight: 'perimeter' - center of mass of the contour, 'area' - center of mass of the polygon area
+    :type weight: str
+    :rtype tuple(float, float)
+    """
 
-        mass += ring_perimeter
+    if not is_polygonal(geom):
+        raise TypeError('Input geometry must have polygon or multipolygon type')
 
-        i += 1
+    coords, ring_offsets, poly_offsets, geom_offsets = pack_wkb_parts([geom.ExportToWkb()])
+    x, y = centroids_batch(coords, ring_offsets, poly_offsets, weight=weight, geom_offsets=geom_offsets)[0]
 
-    res = center * (1.0 / mass)
+    if math.isnan(x):
+        raise ValueError('Contour has zero {}'.format('length' if weight == 'perimeter' else 'area'))
 
-    return res.x, res.y
+    return float(x), float(y)
 
 
 if __name__ == '__main__':
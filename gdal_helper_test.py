@@ -1,6 +1,7 @@
 import unittest
+import numpy as np
 import ogr
-from gdal_helper import Vec2, transform_geom, center_mass
+from gdal_helper import Vec2, transform_geom, transform_geoms, center_mass, geometry_rings
 
 
 class GdalHelperTest(unittest.TestCase):
@@ -37,6 +38,46 @@ class GdalHelperTest(unittest.TestCase):
                 self.assertAlmostEqual(cm[1], response[i][1])
 
 
+    def test_center_mass_area(self):
+
+        geom = ogr.CreateGeometryFromWkt('MULTIPOLYGON(((0 0, 2 0, 2 1, 1 1, 1 2, 0 2, 0 0)), '
+                                         '((4 4, 8 4, 8 8, 4 8, 4 4), (4 4, 6 4, 6 6, 4 6, 4 4)))')
+
+        cm = center_mass(geom, weight='area')
+
+        self.assertAlmostEqual(cm[0], (3 * 5.0 / 6 + 12 * 19.0 / 3) / 15)
+        self.assertAlmostEqual(cm[1], (3 * 5.0 / 6 + 12 * 19.0 / 3) / 15)
+
+        with self.assertRaises(TypeError):
+            center_mass(ogr.CreateGeometryFromWkt('LINESTRING(0 0, 1 1)'))
+
+        with self.assertRaises(ValueError):
+            center_mass(ogr.CreateGeometryFromWkt('POLYGON((1 1, 1 1, 1 1))'))
+
+
+    def test_transform_geoms(self):
+
+        geometries = [ogr.CreateGeometryFromWkt('POLYGON((0 0, 4 0, 4 2, 0 2, 0 0))'),
+                      ogr.CreateGeometryFromWkt('MULTIPOLYGON(((0 0, 1 0, 1 1, 0 0)), ((5 5, 6 5, 6 6, 5 5)))')]
+
+        result = transform_geoms(geometries, shift=[(1.0, 1.0), (0.0, -2.0)], angle=[90, 180], scale=[1.0, 2.0])
+
+        self.assertEqual(result[1].GetGeometryType(), ogr.wkbMultiPolygon)
+        np.testing.assert_allclose(geometry_rings(result[0])[0],
+                                   [[4.0, 0.0], [4.0, 4.0], [2.0, 4.0], [2.0, 0.0], [4.0, 0.0]], atol=1e-12)
+
+        for geom, transformed, shift in zip(geometries, result, [(1.0, 1.0), (0.0, -2.0)]):
+            np.testing.assert_allclose(center_mass(transformed), np.add(center_mass(geom), shift), atol=1e-12)
+
+        for geom, transformed in zip(geometries, result):
+            single = transform_geom(geom, shift=(3, 4), angle=25.0, scale=0.5)
+            batch = transform_geoms([geom], shift=(3, 4), angle=25.0, scale=0.5)[0]
+            self.assertEqual(single.ExportToWkb(), batch.ExportToWkb())
+
+        with self.assertRaises(TypeError):
+            transform_geom(ogr.CreateGeometryFromWkt('LINESTRING(0 0, 1 1)'), shift=(1, 1))
+
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,156 @@
+"""
+Instrumentation of the batch job: wall and CPU time per stage, counters, failures by reason,
+periodic progress and a JSON summary. NULL_STATS is the disabled default, all its methods
+are no-ops, so instrumented code pays one method call per chunk.
+"""
+import json
+import sys
+import time
+from collections import Counter, OrderedDict
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullStats:
+
+    """
+    Disabled instrumentation
+    """
+
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def count(self, name, value=1):
+        pass
+
+    def fail(self, reason, value=1):
+        pass
+
+    def progress(self):
+        pass
+
+    def summary(self):
+        return {}
+
+
+NULL_STATS = NullStats()
+
+
+class _Stage:
+
+    __slots__ = ('stats', 'name', 'wall', 'cpu')
+
+    def __init__(self, stats, name):
+
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+
+        totals = self.stats.stages.setdefault(self.name, [0.0, 0.0, 0])
+        totals[0] += time.perf_counter() - self.wall
+        totals[1] += time.process_time() - self.cpu
+        totals[2] += 1
+        return False
+
+
+class JobStats:
+
+    """
+    Collects stage times and counters of one run.
+    Counter 'features' is the number of written features, features per second are derived from it.
+    :param progress_interval: seconds between progress lines, None disables progress
+    :param stream: output of progress lines
+    """
+
+    enabled = True
+
+    def __init__(self, progress_interval=None, stream=sys.stderr):
+
+        self.stages = OrderedDict()
+        self.counters = Counter()
+        self.failures = Counter()
+
+        self.progress_interval = progress_interval
+        self.stream = stream
+
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._last_progress = self._start_wall
+
+    def stage(self, name):
+
+        """
+        Context manager adding wall and CPU time of the block to the stage
+        """
+
+        return _Stage(self, name)
+
+    def count(self, name, value=1):
+        self.counters[name] += int(value)
+
+    def fail(self, reason, value=1):
+        if value:
+            self.failures[reason] += int(value)
+
+    def progress(self):
+
+        """
+        Prints a progress line if progress_interval has passed since the previous one
+        """
+
+        if self.progress_interval is None:
+            return
+
+        now = time.perf_counter()
+        if now - self._last_progress < self.progress_interval:
+            return
+
+        self._last_progress = now
+        features = self.counters['features']
+        self.stream.write('{} features, {:.0f} features/s, {} failed\n'.format(
+            features, features / max(now - self._start_wall, 1e-9), sum(self.failures.values())))
+        self.stream.flush()
+
+    def summary(self):
+
+        """
+        :return: dict of totals, stage times, counters and failures, JSON serializable
+        """
+
+        wall = time.perf_counter() - self._start_wall
+
+        return {
+            'wall_time': wall,
+            'cpu_time': time.process_time() - self._start_cpu,
+            'features': self.counters['features'],
+            'features_per_second': self.counters['features'] / wall if wall > 0 else 0.0,
+            'vertices': self.counters['vertices'],
+            'stages': OrderedDict((name, {'wall_time': wall_time, 'cpu_time': cpu_time, 'calls': calls})
+                                  for name, (wall_time, cpu_time, calls) in self.stages.items()),
+            'counters': dict(self.counters),
+            'failures': dict(self.failures),
+        }
+
+    def write_summary(self, path):
+
+        with open(path, 'w') as output:
+            json.dump(self.summary(), output, indent=2)
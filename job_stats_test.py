@@ -0,0 +1,73 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from job_stats import JobStats, NULL_STATS
+
+
+class JobStatsTest(unittest.TestCase):
+
+    def test_stages_and_counters(self):
+
+        stats = JobStats()
+
+        for _ in range(3):
+            with stats.stage('compute'):
+                time.sleep(0.01)
+
+        with self.assertRaises(KeyError):
+            with stats.stage('write'):
+                raise KeyError()
+
+        stats.count('features', 40)
+        stats.count('vertices', 1000)
+        stats.fail('degenerate', 2)
+        stats.fail('not_polygonal')
+        stats.fail('degenerate', 0)
+
+        summary = stats.summary()
+
+        self.assertEqual(list(summary['stages']), ['compute', 'write'])
+        self.assertEqual(summary['stages']['compute']['calls'], 3)
+        self.assertGreaterEqual(summary['stages']['compute']['wall_time'], 0.03)
+        self.assertEqual(summary['stages']['write']['calls'], 1)
+        self.assertEqual((summary['features'], summary['vertices']), (40, 1000))
+        self.assertEqual(summary['failures'], {'degenerate': 2, 'not_polygonal': 1})
+        self.assertGreater(summary['features_per_second'], 0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'stats.json')
+            stats.write_summary(path)
+            with open(path) as summary_file:
+                self.assertEqual(json.load(summary_file)['failures'], summary['failures'])
+
+    def test_progress(self):
+
+        stream = io.StringIO()
+        stats = JobStats(progress_interval=0, stream=stream)
+        stats.count('features', 10)
+        stats.fail('degenerate')
+        stats.progress()
+
+        self.assertTrue(stream.getvalue().startswith('10 features, '))
+        self.assertTrue(stream.getvalue().endswith('1 failed\n'))
+
+        stream = io.StringIO()
+        JobStats(progress_interval=3600, stream=stream).progress()
+        self.assertEqual(stream.getvalue(), '')
+
+    def test_disabled(self):
+
+        with NULL_STATS.stage('compute'):
+            NULL_STATS.count('features', 10)
+            NULL_STATS.fail('degenerate')
+            NULL_STATS.progress()
+
+        self.assertEqual(NULL_STATS.summary(), {})
+        self.assertFalse(NULL_STATS.enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
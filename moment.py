@@ -1,28 +1,200 @@
+import math
 from contracts import contract
+import numpy as np
 import ogr
+import moment_jit
 from polynome import Polynome
-from gdal_helper import Vec2
+from gdal_helper import Vec2, geometry_rings, is_polygonal
+from wkb_reader import read_wkb
+from moment_cache import ResultMemo, DEFAULT_MEMO_SIZE, wkb_digest
+from moment_numpy import MomentTable, ring_segments, segment_moment_table, complete_moment_table, \
+    transform_moment_table, hu_moments
+
+BACKENDS = ('numpy', 'polynome')
+
+# hu-moments need moments up to the third order
+DEFAULT_ORDER = 3
 
 
 class Moment:
-    def __init__(self, geom: 'GDAL Polygon'):
 
-        if type(geom) != ogr.Geometry:
-            print("Invalid geometry. Geometry type must be ogr.wkbPolygon")
-            return
+    # opt-in memo of results shared by all instances, see enable_memo
+    memo = None
+
+    def __init__(self, geom: 'GDAL Polygon', backend='numpy'):
+        """
+        :param geom: ogr.Geometry(Polygon|MultiPolygon), moments of multipolygon parts are summed
+        :param backend: 'numpy' - closed form integration over segment arrays, fused numba kernel if installed,
+                        'polynome' - symbolic integration segment by segment
+        """
+
+        self._init_backend(backend)
+
+        if type(geom) != ogr.Geometry or not is_polygonal(geom):
+            raise TypeError('Invalid geometry. Geometry type must be ogr.wkbPolygon or ogr.wkbMultiPolygon')
         self.geom = geom
-        rings = [geom.GetGeometryRef(i) for i in range(0, geom.GetGeometryCount())]
+        self._init_rings(geometry_rings(geom))
+
+    @classmethod
+    def from_wkb(cls, data, backend='numpy'):
+        """
+        Creates Moment straight from WKB Polygon or MultiPolygon, coordinates are read with np.frombuffer
+        without ogr.Geometry round-trips
 
-        segments=[]
+        :param data: WKB bytes
+        :param backend: see Moment.__init__
+        """
+        instance = cls.__new__(cls)
+        instance._init_backend(backend)
+        instance.geom = None
+        instance._init_rings([ring for polygon in read_wkb(data) for ring in polygon])
+        # rings are views of data anyway, it is hashed only if memo is used
+        instance._wkb = data
+
+        return instance
+
+    @classmethod
+    def from_wkb_batch(cls, wkbs, backend='numpy'):
+        """
+        Creates Moment for every WKB geometry of the iterable
+        :rtype: list
+        """
+        return [cls.from_wkb(data, backend=backend) for data in wkbs]
+
+    @classmethod
+    def enable_memo(cls, maxsize=DEFAULT_MEMO_SIZE):
+        """
+        Memoizes compute/compute_hu/compute_hu_all results across instances built from equal geometries,
+        results are keyed by the WKB digest of the geometry, backend and call arguments
+
+        :param maxsize: number of memoized results, least recently used ones are evicted
+        :return: ResultMemo, its stats and hit_rate help to size the memo
+        """
+        cls.memo = ResultMemo(maxsize)
+        return cls.memo
 
-        for ring in rings:
-            for i in range(1, ring.GetPointCount()):
-                v1 = Vec2(ring.GetPoint(i-1)[:-1])
-                v2 = Vec2(ring.GetPoint(i)[:-1])
-                if v1 != v2:
-                    segments.append([v1, v2])
+    @classmethod
+    def disable_memo(cls):
+        cls.memo = None
 
-        self.segments = segments
+    def _init_backend(self, backend):
+
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend {}, expected one of {}'.format(backend, BACKENDS))
+        self.backend = backend
+        self._table = None
+        self._wkb = None
+        self._digest = None
+
+    def _memoized(self, key, function):
+
+        # moments of transformed instances are not bound to any geometry, they are never memoized
+        memo = self.memo
+        if memo is None or self.rings is None:
+            return function()
+
+        if self._digest is None:
+            self._digest = wkb_digest(self.geom.ExportToWkb() if self._wkb is None else self._wkb)
+
+        return memo.get_or_compute((self._digest, self.backend) + key, function)
+
+    def _init_rings(self, rings):
+
+        self.rings = rings
+
+        # segments are kept relative to the bounding box center, it saves precision of large projected coordinates
+        starts, ends = ring_segments(self.rings)
+        self._origin = (starts.min(axis=0) + starts.max(axis=0)) / 2.0 if len(starts) else np.zeros(2)
+        self._starts = starts - self._origin
+        self._ends = ends - self._origin
+
+    @property
+    def segments(self):
+        """
+        Non-degenerate segments of contour as list of [Vec2, Vec2] pairs
+        """
+        if self.rings is None:
+            return []
+        return [[Vec2(start), Vec2(end)] for start, end in
+                zip((self._starts + self._origin).tolist(), (self._ends + self._origin).tolist())]
+
+    @contract
+    def moment_table(self, max_order=DEFAULT_ORDER):
+        """
+        Computes raw, central and scale normalized moments of contour for all i, j <= max_order
+        in one pass over the segments. The result is cached, a smaller table is sliced
+        from the cached one.
+
+        :type max_order: int,>=1,<=10
+        :rtype: tuple
+        """
+        return self._moment_table(max_order)
+
+    def _moment_table(self, max_order):
+
+        if self._table is None or self._table.raw.shape[0] <= max_order:
+            if self.rings is None:
+                raise ValueError('Moments of order {} are not available, contour is unknown'.format(max_order))
+            self._table = self._compute_table(max_order)
+
+        if self._table.raw.shape[0] == max_order + 1:
+            return self._table
+
+        return MomentTable(*(t[:max_order + 1, :max_order + 1] for t in self._table))
+
+    def _compute_table(self, max_order):
+
+        # moments about the bounding box center, then re-centred analytically
+        if self.backend == 'numpy' and moment_jit.ENABLED:
+            local = moment_jit.local_moment_table(self._starts, self._ends, max_order)
+        elif self.backend == 'numpy':
+            local = segment_moment_table(self._starts, self._ends, max_order).sum(axis=0)
+        else:
+            local = np.zeros((max_order + 1, max_order + 1))
+
+            for (b1, b2), (x1, y1) in zip(self._starts.tolist(), self._ends.tolist()):
+                dx = x1 - b1
+                dy = y1 - b2
+
+                length = math.hypot(dx, dy)
+                k1 = dx / length
+                k2 = dy / length
+
+                for i in range(max_order + 1):
+                    for j in range(max_order + 1):
+                        local[i, j] += self.compute_segment_moment(i, j, length, k1, b1, k2, b2, None, None)
+
+        if local[0, 0] == 0:
+            raise ValueError('Contour has zero length')
+
+        return complete_moment_table(local, self._origin)
+
+    @contract
+    def transformed(self, shift=None, angle=None, scale=None, max_order=DEFAULT_ORDER):
+        """
+        Returns moments of the contour transformed like gdal_helper.transform_geom does:
+        translation by shift, rotation by angle and scaling about the center of mass.
+        The new moment table is derived from the cached one, segments are not integrated again.
+        Moments of the result are available up to max_order only.
+
+        :type shift: tuple(float|int, float|int)|None
+        :param angle: degrees
+        :type angle: float|int|None
+        :type scale: (float|int,>0)|None
+        :type max_order: int,>=1,<=5
+        """
+        source = self._moment_table(2 * max_order if angle else max_order)
+
+        table = transform_moment_table(source, shift=shift or (0.0, 0.0), angle=math.radians(angle or 0.0),
+                                       scale=scale or 1.0)
+
+        instance = self.__class__.__new__(self.__class__)
+        instance._init_backend(self.backend)
+        instance.geom = None
+        instance.rings = None
+        instance._table = table
+
+        return instance
 
     @contract
     def compute(self, i, j, central=True, scale_inv=False):
@@ -35,42 +207,19 @@ class Moment:
         :type scale_inv: bool
         :rtype: float
         """
-        if scale_inv:
-            central = True
-
-        m_result = 0
-        av_x = 0
-        av_y = 0
-
-        if (central):
-            m00 = self.compute(0, 0, central=False, scale_inv=False)
-            m01 = self.compute(0, 1, central=False, scale_inv=False)
-            m10 = self.compute(1, 0, central=False, scale_inv=False)
-            av_x += -m10 / m00
-            av_y += -m01 / m00
-
+        return self._memoized(('compute', i, j, central, scale_inv), lambda: self._compute(i, j, central, scale_inv))
 
-        for s in self.segments:
-            dx = (s[1].x - s[0].x)
-            dy = (s[1].y - s[0].y)
+    def _compute(self, i, j, central, scale_inv):
 
-            length = ((s[1] - s[0]).length())
-            k1 = dx / length
-            k2 = dy / length
+        table = self._moment_table(max(i, j) if self.rings is None else max(i, j, DEFAULT_ORDER))
 
-            b1 = av_x + s[0].x
-            b2 = av_y + s[0].y
-
-            k3 = dx * dy / length**2
-            b3 = s[0].y*dx/length
-
-            m = self.compute_segment_moment(i, j, length, k1, b1, k2, b2, k3, b3)
+        if scale_inv:
+            return float(table.normalized[i, j])
 
-            m_result += m
+        if central:
+            return float(table.central[i, j])
 
-        if scale_inv:
-            m_result = m_result/(m00**((i+j)+1))
-        return m_result
+        return float(table.raw[i, j])
 
     @staticmethod
     def compute_segment_moment(i, j, length, k1, b1, k2, b2, k3, b3):
@@ -92,44 +241,25 @@ class Moment:
         :type scale_inv: bool
         :rtype: float
         """
-        f = lambda ii, jj: self.compute(ii, jj, scale_inv=scale_inv, central=True)
-
-        if i == 0:
-            return f(2, 0) + f(0, 2)
-
-        if i == 1:
-            return (f(2, 0) - f(0, 2)) ** 2 + 4 * f(1, 1) ** 2
-
-        if i == 2:
-            return (f(3, 0) - 3 * f(1, 2)) ** 2 + (3 * f(2, 1) - f(0, 3)) ** 2
-
-        if i ==3:
-            return (f(3, 0) + f(1, 2)) ** 2 + (f(2, 1) + f(0, 3)) ** 2
-
-        if i ==4:
-            f30 = f(3, 0)
-            f12 = f(1, 2)
-            f21 = f(2, 1)
-            f03 = f(0, 3)
-            return ((f30 - 3 * f12) * (f30 + f12) * ((f30 + f12) ** 2 - 3 * (f21 + f03) ** 2)
-                             + (f30 - 3 * f12) * (f30+ f12) * ((f30 + f12) ** 2 - 3 * (f21 + f03) ** 2))
-        if i == 5:
-            f20 = f(2, 0)
-            f02 = f(0, 2)
-            f30 = f(3, 0)
-            f03 = f(0, 3)
-            f12 = f(1, 2)
-            f21 = f(2, 1)
-            f11 = f(1, 1)
-            return ((f20 - f02) * ((f30 + f12) ** 2 - (f21 + f03) ** 2)
-                             + 4 * f11 * (f30 + f12) * (f21 + f03))
-        if i == 6:
-            f30 = f(3, 0)
-            f03 = f(0, 3)
-            f12 = f(1, 2)
-            f21 = f(2, 1)
-            return ((3 * f21 - f03) * (f30 + f12) * ((f30 + f12) ** 2 - 3 * (f21 + f03) ** 2) -
-                             (f30 - 3 * f12) * (f21 + f03) * (3 * (f30 + f12) ** 2 - (f21 + f03) ** 2))
+        return self._hu_all(scale_inv)[i]
+
+    @contract
+    def compute_hu_all(self, scale_inv=True):
+        """
+        Computes all seven hu-moments from a single set of central moments
+        :param scale_inv: scale invariance
+        :type scale_inv: bool
+        :rtype: tuple
+        """
+        return self._hu_all(scale_inv)
+
+    def _hu_all(self, scale_inv):
+
+        return self._memoized(('hu', scale_inv), lambda: self._compute_hu_all(scale_inv))
 
+    def _compute_hu_all(self, scale_inv):
 
+        table = self._moment_table(DEFAULT_ORDER)
+        moments = table.normalized if scale_inv else table.central
 
+        return tuple(float(hu) for hu in hu_moments(moments))
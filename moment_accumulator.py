@@ -0,0 +1,192 @@
+import numpy as np
+from moment_numpy import segment_moment_table, complete_moment_table
+
+
+class MomentAccumulator:
+
+    """
+    Contour moments of editable rings. Moments are sums over segments, so every edit
+    subtracts the integrals of the removed segments and adds the integrals of the new ones,
+    the cost depends on the number of changed segments only.
+
+    Rings are stored open: the closing vertex of the input equals the first one and is dropped,
+    vertex k is connected to vertex (k + 1) % n.
+    """
+
+    def __init__(self, rings, max_order=3):
+
+        """
+        :param rings: list of (N, 2) arrays or sequences of vertices
+        :param max_order: max power of x and y of the moment table
+        """
+
+        self.max_order = max(int(max_order), 1)
+        self._rings = []
+
+        points = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+        nonempty = [ring for ring in points if len(ring)]
+
+        # segments are integrated about a fixed origin near the contour, see Moment
+        if nonempty:
+            stacked = np.concatenate(nonempty)
+            self._origin = (stacked.min(axis=0) + stacked.max(axis=0)) / 2.0
+        else:
+            self._origin = np.zeros(2)
+
+        self._local = np.zeros((self.max_order + 1, self.max_order + 1))
+
+        for ring in points:
+            self.add_ring(ring)
+
+    @classmethod
+    def from_geometry(cls, geom, max_order=3):
+
+        """
+        :param geom: ogr.Geometry(Polygon|MultiPolygon)
+        """
+
+        from gdal_helper import geometry_rings
+
+        return cls(geometry_rings(geom), max_order=max_order)
+
+    @property
+    def rings(self):
+
+        """
+        Closed rings as list of (N, 2) arrays
+        """
+
+        return [np.array(ring + ring[:1], dtype=np.float64).reshape(-1, 2) for ring in self._rings]
+
+    def _accumulate(self, segments, sign):
+
+        if not segments:
+            return
+
+        segments = np.asarray(segments, dtype=np.float64) - self._origin
+        self._local += sign * segment_moment_table(segments[:, 0], segments[:, 1], self.max_order).sum(axis=0)
+
+    def _ring_segments(self, ring):
+
+        return [(ring[k - 1], ring[k]) for k in range(len(ring))] if len(ring) > 1 else []
+
+    def add_segment(self, start, end):
+
+        """
+        Adds a free segment, not attached to any ring
+        """
+
+        self._accumulate([(start, end)], 1.0)
+
+    def remove_segment(self, start, end):
+
+        """
+        Removes a free segment added with add_segment
+        """
+
+        self._accumulate([(start, end)], -1.0)
+
+    def replace_segment(self, old, new):
+
+        """
+        Replaces free segment old = (start, end) by new = (start, end)
+        """
+
+        self._accumulate([old], -1.0)
+        self._accumulate([new], 1.0)
+
+    def add_ring(self, points):
+
+        """
+        Adds a ring, closing vertex is optional
+        :return: ring index
+        """
+
+        ring = [tuple(point) for point in np.asarray(points, dtype=np.float64).reshape(-1, 2).tolist()]
+
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring.pop()
+
+        self._rings.append(ring)
+        self._accumulate(self._ring_segments(ring), 1.0)
+
+        return len(self._rings) - 1
+
+    def remove_ring(self, ring_index):
+
+        ring = self._rings.pop(ring_index)
+        self._accumulate(self._ring_segments(ring), -1.0)
+
+    def move_vertex(self, ring_index, vertex_index, point):
+
+        ring = self._rings[ring_index]
+        n = len(ring)
+        prev, old, next = ring[vertex_index - 1], ring[vertex_index], ring[(vertex_index + 1) % n]
+        point = (float(point[0]), float(point[1]))
+
+        self._accumulate([(prev, old), (old, next)], -1.0)
+        self._accumulate([(prev, point), (point, next)], 1.0)
+
+        ring[vertex_index] = point
+
+    def insert_vertex(self, ring_index, vertex_index, point):
+
+        """
+        Inserts point before vertex vertex_index, the new vertex gets index vertex_index
+        """
+
+        ring = self._rings[ring_index]
+        n = len(ring)
+        point = (float(point[0]), float(point[1]))
+
+        if n < 2:
+            ring.insert(vertex_index, point)
+            self._accumulate(self._ring_segments(ring), 1.0)
+            return
+
+        prev, next = ring[vertex_index - 1], ring[vertex_index % n]
+
+        self._accumulate([(prev, next)], -1.0)
+        self._accumulate([(prev, point), (point, next)], 1.0)
+
+        ring.insert(vertex_index, point)
+
+    def delete_vertex(self, ring_index, vertex_index):
+
+        ring = self._rings[ring_index]
+        n = len(ring)
+
+        if n <= 2:
+            self._accumulate(self._ring_segments(ring), -1.0)
+            ring.pop(vertex_index)
+            return
+
+        prev, old, next = ring[vertex_index - 1], ring[vertex_index], ring[(vertex_index + 1) % n]
+
+        self._accumulate([(prev, old), (old, next)], -1.0)
+        self._accumulate([(prev, next)], 1.0)
+
+        ring.pop(vertex_index)
+
+    def rebuild(self):
+
+        """
+        Recomputes the sums from the current rings, drops rounding drift of a long edit session
+        (free segments added with add_segment are lost)
+        """
+
+        self._local[...] = 0.0
+
+        for ring in self._rings:
+            self._accumulate(self._ring_segments(ring), 1.0)
+
+    def moment_table(self):
+
+        """
+        :return: MomentTable of raw, central and normalized moments up to max_order
+        """
+
+        if self._local[0, 0] <= 0:
+            raise ValueError('Contour has zero length')
+
+        return complete_moment_table(self._local, self._origin)
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from moment_batch import pack_polygons, moment_tables_batch
+from moment_accumulator import MomentAccumulator
+
+
+class MomentAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rings = [np.array([(0, 0), (5, 1), (6, 4), (2, 7), (-1, 3), (0, 0)], dtype=np.float64),
+                      np.array([(1, 2), (2, 2), (2, 3), (1, 2)], dtype=np.float64)]
+
+    def assertTableEqual(self, accumulator, rings):
+
+        expected = moment_tables_batch(*pack_polygons([rings]), max_order=accumulator.max_order)
+        actual = accumulator.moment_table()
+
+        for name in ('raw', 'central', 'normalized'):
+            with self.subTest(table=name):
+                np.testing.assert_allclose(getattr(actual, name), getattr(expected, name)[0], rtol=1e-9, atol=1e-9)
+
+    def test_initial(self):
+
+        accumulator = MomentAccumulator(self.rings, max_order=4)
+        self.assertTableEqual(accumulator, self.rings)
+
+    def test_vertex_edits(self):
+
+        accumulator = MomentAccumulator(self.rings)
+
+        accumulator.move_vertex(0, 2, (7, 5))
+        accumulator.insert_vertex(0, 3, (4, 8))
+        accumulator.delete_vertex(1, 0)
+        accumulator.insert_vertex(1, 0, (1.5, 1.5))
+        accumulator.move_vertex(0, 0, (0.5, -0.5))
+
+        self.assertTableEqual(accumulator, accumulator.rings)
+
+        expected = [np.array([(0.5, -0.5), (5, 1), (7, 5), (4, 8), (2, 7), (-1, 3), (0.5, -0.5)]),
+                    np.array([(1.5, 1.5), (2, 2), (2, 3), (1.5, 1.5)])]
+
+        for ring, expected_ring in zip(accumulator.rings, expected):
+            np.testing.assert_array_equal(ring, expected_ring)
+
+        self.assertTableEqual(accumulator, expected)
+
+    def test_ring_and_segment_edits(self):
+
+        accumulator = MomentAccumulator(self.rings[:1])
+        accumulator.add_ring(self.rings[1])
+        self.assertTableEqual(accumulator, self.rings)
+
+        accumulator.remove_ring(1)
+        self.assertTableEqual(accumulator, self.rings[:1])
+
+        accumulator.add_segment((10, 10), (12, 10))
+        accumulator.replace_segment(((10, 10), (12, 10)), ((1, 2), (2, 2)))
+        accumulator.add_segment((2, 2), (2, 3))
+        accumulator.add_segment((2, 3), (1, 2))
+        self.assertTableEqual(accumulator, self.rings)
+
+    def test_rebuild(self):
+
+        accumulator = MomentAccumulator(self.rings)
+
+        for k in range(100):
+            accumulator.move_vertex(0, 1, (5 + k * 0.01, 1 - k * 0.02))
+
+        before = accumulator.moment_table()
+        accumulator.rebuild()
+
+        np.testing.assert_allclose(accumulator.moment_table().central, before.central, rtol=1e-9, atol=1e-9)
+        self.assertTableEqual(accumulator, accumulator.rings)
+
+    def test_empty(self):
+
+        accumulator = MomentAccumulator([])
+
+        with self.assertRaises(ValueError):
+            accumulator.moment_table()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,342 @@
+"""
+Contour moments of many polygons at once.
+
+Polygons are passed in the packed ragged layout used by GeoArrow:
+    coords       - (N, 2) float64 array (or flat interleaved x, y array) of all vertices
+    ring_offsets - (R + 1,) int array, ring k owns vertices coords[ring_offsets[k]:ring_offsets[k + 1]]
+    poly_offsets - (P + 1,) int array, polygon k owns rings ring_offsets[poly_offsets[k]:poly_offsets[k + 1]]
+    geom_offsets - optional (G + 1,) int array of MultiPolygon layout, geometry k owns polygons
+                   poly_offsets[geom_offsets[k]:geom_offsets[k + 1]], moments of the parts are summed
+"""
+import numpy as np
+import moment_jit
+from moment_numpy import MomentTable, segment_moment_table, complete_moment_table, hu_moments
+
+CENTROID_WEIGHTS = ('perimeter', 'area')
+
+
+def pack_polygons(polygons):
+
+    """
+    Packs polygons into the ragged layout
+    :param polygons: list of polygons, each polygon is a list of (N, 2) arrays of ring vertices
+    :return: coords, ring_offsets, poly_offsets
+    """
+
+    rings = [ring for polygon in polygons for ring in polygon]
+
+    poly_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    poly_offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+
+    ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    ring_offsets[1:] = np.cumsum([len(ring) for ring in rings])
+
+    coords = np.concatenate(rings).astype(np.float64) if rings else np.empty((0, 2))
+
+    return coords.reshape(-1, 2), ring_offsets, poly_offsets
+
+
+def _ring_segments(coords, ring_offsets):
+
+    """
+    Splits packed rings into non-degenerate segments
+    :return: starts, ends, ring index of each segment (sorted)
+    """
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+    ring_count = len(ring_offsets) - 1
+
+    # every vertex except the last one of its ring starts a segment
+    vertex_ring = np.repeat(np.arange(ring_count), np.diff(ring_offsets))
+    vertices = np.arange(ring_offsets[0], ring_offsets[-1])
+    is_start = vertices + 1 < ring_offsets[1:][vertex_ring]
+
+    vertices = vertices[is_start]
+    starts = coords[vertices]
+    ends = coords[vertices + 1]
+
+    valid = np.any(starts != ends, axis=1)
+
+    return starts[valid], ends[valid], vertex_ring[is_start][valid]
+
+
+def _packed_segments(coords, ring_offsets, poly_offsets):
+
+    """
+    Splits packed rings into non-degenerate segments
+    :return: starts, ends, polygon index of each segment (sorted)
+    """
+
+    poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+    ring_poly = np.repeat(np.arange(len(poly_offsets) - 1), np.diff(poly_offsets))
+
+    starts, ends, segment_ring = _ring_segments(coords, ring_offsets)
+
+    return starts, ends, ring_poly[segment_ring]
+
+
+def _reduce_by_polygon(ufunc, values, segment_poly, poly_count):
+
+    """
+    Applies ufunc.reduceat to the segment values of every polygon, polygons without segments get zeros
+    """
+
+    counts = np.bincount(segment_poly, minlength=poly_count)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    result = np.zeros((poly_count,) + values.shape[1:])
+    nonempty = counts > 0
+
+    if nonempty.any():
+        result[nonempty] = ufunc.reduceat(values, offsets[nonempty], axis=0)
+
+    return result
+
+
+def _geometry_offsets(poly_offsets, geom_offsets):
+
+    """
+    Maps MultiPolygon layout to one entry per geometry: all rings of the parts belong to the geometry
+    """
+
+    poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+
+    if geom_offsets is None:
+        return poly_offsets
+
+    return poly_offsets[np.asarray(geom_offsets, dtype=np.int64)]
+
+
+def moment_tables_batch(coords, ring_offsets, poly_offsets, max_order=3, geom_offsets=None):
+
+    """
+    Computes raw, central and normalized moment tables of every polygon in one vectorized pass,
+    or in one fused loop of moment_jit when numba is installed.
+    Polygons with zero perimeter get zero raw moments and undefined (NaN) central and normalized ones.
+    :param max_order: max power of x and y
+    :param geom_offsets: MultiPolygon offsets, if given the result has one entry per geometry
+    :return: MomentTable of (P, max_order + 1, max_order + 1) arrays
+    """
+
+    poly_offsets = _geometry_offsets(poly_offsets, geom_offsets)
+    order = max(max_order, 1)
+    poly_count = len(poly_offsets) - 1
+
+    if moment_jit.ENABLED:
+        local, origin = moment_jit.packed_local_tables(coords, ring_offsets, poly_offsets, order)
+    else:
+        starts, ends, segment_poly = _packed_segments(coords, ring_offsets, poly_offsets)
+
+        # moments are integrated about the bounding box center of each polygon to keep precision
+        origin = (_reduce_by_polygon(np.minimum, starts, segment_poly, poly_count) +
+                  _reduce_by_polygon(np.maximum, starts, segment_poly, poly_count)) / 2.0
+
+        local = segment_moment_table(starts - origin[segment_poly], ends - origin[segment_poly], order)
+        local = _reduce_by_polygon(np.add, local, segment_poly, poly_count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = complete_moment_table(local, origin)
+
+    return MomentTable(*(t[:, :max_order + 1, :max_order + 1] for t in table))
+
+
+def compute_moments_batch(coords, ring_offsets, poly_offsets, orders, central=True, scale_inv=False,
+                          geom_offsets=None):
+
+    """
+    Computes the requested moments of every polygon
+    :param orders: sequence of (i, j) moment indexes
+    :param central: central moments
+    :param scale_inv: scale normalized central moments
+    :param geom_offsets: MultiPolygon offsets, if given the result has one row per geometry
+    :return: (P, len(orders)) array
+    """
+
+    orders = np.asarray(orders, dtype=np.int64).reshape(-1, 2)
+
+    if (orders < 0).any():
+        raise ValueError('Moment indexes must be non-negative')
+
+    table = moment_tables_batch(coords, ring_offsets, poly_offsets, max_order=int(orders.max(initial=1)),
+                                geom_offsets=geom_offsets)
+
+    if scale_inv:
+        moments = table.normalized
+    elif central:
+        moments = table.central
+    else:
+        moments = table.raw
+
+    return moments[:, orders[:, 0], orders[:, 1]]
+
+
+def compute_hu_batch(coords, ring_offsets, poly_offsets, scale_inv=True, geom_offsets=None):
+
+    """
+    Computes seven hu-moments of every polygon
+    :return: (P, 7) array
+    """
+
+    table = moment_tables_batch(coords, ring_offsets, poly_offsets, max_order=3, geom_offsets=geom_offsets)
+
+    with np.errstate(invalid='ignore'):
+        return hu_moments(table.normalized if scale_inv else table.central)
+
+
+def compute_perimeter_hu_batch(coords, ring_offsets, poly_offsets, geom_offsets=None):
+
+    """
+    Computes perimeter and seven scale invariant hu-moments of every polygon, the row layout of the batch job
+    :return: (P, 8) array
+    """
+
+    table = moment_tables_batch(coords, ring_offsets, poly_offsets, max_order=3, geom_offsets=geom_offsets)
+
+    with np.errstate(invalid='ignore'):
+        return np.column_stack((table.central[:, 0, 0], hu_moments(table.normalized)))
+
+
+def centroids_batch(coords, ring_offsets, poly_offsets, weight='perimeter', geom_offsets=None):
+
+    """
+    Computes centroid of every polygon:
+        perimeter - center of mass of the contour, mean of segment midpoints weighted by segment lengths
+        area      - center of mass of the polygon area, holes are subtracted whatever the ring orientation,
+                    the first ring of every polygon is its exterior ring
+    Polygons with zero perimeter (area) get NaN.
+    :param geom_offsets: MultiPolygon offsets, if given the result has one entry per geometry
+    :return: (P, 2) array
+    """
+
+    if weight not in CENTROID_WEIGHTS:
+        raise ValueError('Unknown centroid weight {}, expected one of {}'.format(weight, CENTROID_WEIGHTS))
+
+    ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+    poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+
+    ring_count = len(ring_offsets) - 1
+    ring_poly = np.repeat(np.arange(len(poly_offsets) - 1), np.diff(poly_offsets))
+
+    if geom_offsets is None:
+        ring_group = ring_poly
+        group_count = len(poly_offsets) - 1
+    else:
+        geom_offsets = np.asarray(geom_offsets, dtype=np.int64)
+        ring_group = np.repeat(np.arange(len(geom_offsets) - 1), np.diff(geom_offsets))[ring_poly]
+        group_count = len(geom_offsets) - 1
+
+    starts, ends, segment_ring = _ring_segments(coords, ring_offsets)
+    segment_group = ring_group[segment_ring]
+
+    # coordinates relative to the bounding box center keep precision of large projected coordinates
+    origin = (_reduce_by_polygon(np.minimum, starts, segment_group, group_count) +
+              _reduce_by_polygon(np.maximum, starts, segment_group, group_count)) / 2.0
+
+    starts = starts - origin[segment_group]
+    ends = ends - origin[segment_group]
+
+    if weight == 'perimeter':
+        weights = np.hypot(ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1])
+        moments = (starts + ends) * (weights / 2.0)[:, None]
+    else:
+        cross = starts[:, 0] * ends[:, 1] - ends[:, 0] * starts[:, 1]
+
+        # exterior rings count positive, holes negative, whatever their orientation
+        is_exterior = np.zeros(ring_count, dtype=bool)
+        is_exterior[poly_offsets[:-1][np.diff(poly_offsets) > 0]] = True
+        ring_sign = np.where(is_exterior, 1.0, -1.0) * np.sign(np.bincount(segment_ring, cross, minlength=ring_count))
+
+        cross = cross * ring_sign[segment_ring]
+        weights = cross / 2.0
+        moments = (starts + ends) * (cross / 6.0)[:, None]
+
+    total = np.bincount(segment_group, weights, minlength=group_count)
+    sums = np.column_stack([np.bincount(segment_group, moments[:, k], minlength=group_count) for k in range(2)])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centroids = sums / total[:, None] + origin
+
+    centroids[total == 0] = np.nan
+
+    return centroids
+
+
+def affine_matrix(center, shift=None, angle=None, scale=None):
+
+    """
+    Composes steps of gdal_helper.transform_geom into one 3x3 matrix acting on (x, y, 1) columns:
+    translation by shift, then counterclockwise rotation by angle and scaling about center + shift.
+    Arguments are broadcast, a (G, 2) center gives a (G, 3, 3) stack of matrices.
+    :param center: (2,) or (G, 2) rotation and scaling center before the translation
+    :param shift: (2,) or (G, 2) translation, None - no translation
+    :param angle: degrees, scalar or (G,), None - no rotation
+    :param scale: scalar or (G,), None - no scaling
+    :rtype: numpy.ndarray
+    """
+
+    center = np.asarray(center, dtype=np.float64)
+    shift = np.zeros(2) if shift is None else np.asarray(shift, dtype=np.float64)
+    angle = np.radians(np.asarray(0.0 if angle is None else angle, dtype=np.float64))
+    scale = np.asarray(1.0 if scale is None else scale, dtype=np.float64)
+
+    shape = np.broadcast_shapes(center.shape[:-1], shift.shape[:-1], angle.shape, scale.shape)
+
+    cos = scale * np.cos(angle)
+    sin = scale * np.sin(angle)
+
+    matrix = np.zeros(shape + (3, 3))
+    matrix[..., 0, 0] = cos
+    matrix[..., 0, 1] = -sin
+    matrix[..., 1, 0] = sin
+    matrix[..., 1, 1] = cos
+    matrix[..., 2, 2] = 1.0
+
+    # p' = A (p + shift - c) + c with c = center + shift, so the translation is center + shift - A center
+    matrix[..., :2, 2] = center + shift - np.einsum('...ij,...j->...i', matrix[..., :2, :2],
+                                                    np.broadcast_to(center, shape + (2,)))
+
+    return matrix
+
+
+def transform_packed(coords, ring_offsets, poly_offsets, shift=None, angle=None, scale=None, geom_offsets=None,
+                     out=None):
+
+    """
+    Transforms every geometry of the packed layer like gdal_helper.transform_geom: translation by shift,
+    rotation by angle and scaling about the perimeter centroid of the geometry, one matrix per geometry.
+    Parameters are shared by all geometries or given per geometry, see affine_matrix.
+    Contours of zero length are transformed about their first vertex.
+    :param out: (N, 2) array receiving the result, coords itself transforms them in place
+    :return: (N, 2) array of transformed coordinates, offsets stay valid
+    """
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+    poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+    geom_offsets = np.arange(len(poly_offsets)) if geom_offsets is None else np.asarray(geom_offsets, dtype=np.int64)
+
+    geom_count = len(geom_offsets) - 1
+
+    if angle is None and scale is None:
+        centers = np.zeros((geom_count, 2))
+    else:
+        centers = centroids_batch(coords, ring_offsets, poly_offsets, geom_offsets=geom_offsets)
+
+        degenerate = np.flatnonzero(np.isnan(centers[:, 0]))
+        if len(degenerate) and len(coords):
+            first = ring_offsets[np.minimum(poly_offsets[geom_offsets[degenerate]], len(ring_offsets) - 1)]
+            centers[degenerate] = coords[np.minimum(first, len(coords) - 1)]
+
+    matrices = affine_matrix(centers, shift, angle, scale)
+
+    ring_geom = np.repeat(np.repeat(np.arange(geom_count), np.diff(geom_offsets)), np.diff(poly_offsets))
+    vertex_matrices = matrices[np.repeat(ring_geom, np.diff(ring_offsets))]
+
+    result = np.einsum('nij,nj->ni', vertex_matrices[:, :2, :2], coords) + vertex_matrices[:, :2, 2]
+
+    if out is None:
+        return result
+
+    out[...] = result
+    return out
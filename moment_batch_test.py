@@ -0,0 +1,163 @@
+import math
+import unittest
+import numpy as np
+import ogr
+from gdal_helper import transform_geom, geometry_rings
+from moment import Moment
+from moment_batch import pack_polygons, compute_moments_batch, compute_hu_batch, moment_tables_batch, centroids_batch, \
+    affine_matrix, transform_packed
+
+
+class MomentBatchTest(unittest.TestCase):
+
+    def setUp(self):
+
+        wkts = ['POLYGON((-2 -2, 2 -2, 2 2, -2 2, -2 -2), (-1 -1, 1 -1, 1 1, -1 1, -1 -1))',
+                'POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))',
+                'POLYGON((4500000 5600000, 4500020 5600003, 4500020 5600003, 4500011 5600017, 4500000 5600000))']
+
+        self.geometries = [ogr.CreateGeometryFromWkt(wkt) for wkt in wkts]
+        self.geometries.append(transform_geom(self.geometries[1], shift=(3.5, -1.2), angle=17, scale=1.3))
+
+        self.packed = pack_polygons([geometry_rings(geom) for geom in self.geometries])
+
+    def test_pack_polygons(self):
+
+        coords, ring_offsets, poly_offsets = self.packed
+
+        self.assertEqual(coords.shape, (27, 2))
+        self.assertEqual(list(ring_offsets), [0, 5, 10, 16, 21, 27])
+        self.assertEqual(list(poly_offsets), [0, 2, 3, 4, 5])
+
+    def test_against_moment(self):
+
+        orders = [(i, j) for i in range(5) for j in range(5)]
+
+        for central, scale_inv in ((False, False), (True, False), (True, True)):
+
+            result = compute_moments_batch(*self.packed, orders, central=central, scale_inv=scale_inv)
+
+            self.assertEqual(result.shape, (len(self.geometries), len(orders)))
+
+            for k, geom in enumerate(self.geometries):
+
+                m = Moment(geom)
+
+                for n, (i, j) in enumerate(orders):
+
+                    with self.subTest(k=k, i=i, j=j, central=central, scale_inv=scale_inv):
+                        reference = m.compute(i, j, central=central, scale_inv=scale_inv)
+                        self.assertTrue(math.isclose(result[k, n], reference, rel_tol=1e-9, abs_tol=1e-9))
+
+    def test_hu_batch(self):
+
+        hu = compute_hu_batch(*self.packed)
+
+        for k, geom in enumerate(self.geometries):
+
+            with self.subTest(k=k):
+                np.testing.assert_allclose(hu[k], Moment(geom).compute_hu_all(), rtol=1e-9, atol=1e-15)
+
+    def test_geom_offsets(self):
+
+        coords, ring_offsets, poly_offsets = self.packed
+
+        # geometries: first two polygons as one multipolygon, then the other two separately
+        result = compute_moments_batch(coords, ring_offsets, poly_offsets, [(0, 0), (1, 0), (2, 1)], central=False,
+                                       geom_offsets=[0, 2, 3, 4])
+        parts = compute_moments_batch(coords, ring_offsets, poly_offsets, [(0, 0), (1, 0), (2, 1)], central=False)
+
+        self.assertEqual(result.shape, (3, 3))
+        np.testing.assert_allclose(result[0], parts[0] + parts[1], rtol=1e-12)
+        np.testing.assert_allclose(result[1:], parts[2:], rtol=1e-12)
+
+    def test_square(self):
+
+        coords = np.array([0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0, 0.0, 0.0])
+
+        result = compute_moments_batch(coords, [0, 5], [0, 1], [(0, 0), (1, 0), (0, 1)], central=False)
+
+        np.testing.assert_allclose(result, [[4.0, 2.0, 2.0]])
+
+    def test_empty_polygon(self):
+
+        coords, ring_offsets, poly_offsets = pack_polygons([[np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])],
+                                                            [],
+                                                            [np.array([[2.0, 2.0], [2.0, 2.0]])]])
+
+        table = moment_tables_batch(coords, ring_offsets, poly_offsets)
+
+        self.assertAlmostEqual(table.raw[0, 0, 0], 2.0 + math.sqrt(2.0))
+        self.assertTrue((table.raw[1:] == 0).all())
+        self.assertTrue(np.isnan(table.normalized[1:]).all())
+
+
+    def test_centroids(self):
+
+        triangle = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+        l_shape = np.array([[0.0, 0.0], [2.0, 0.0], [2.0, 1.0], [1.0, 1.0], [1.0, 2.0], [0.0, 2.0], [0.0, 0.0]])
+        square = np.array([[4.0, 4.0], [8.0, 4.0], [8.0, 8.0], [4.0, 8.0], [4.0, 4.0]])
+        # hole in the corner of the square, listed in the same orientation as the exterior ring
+        hole = np.array([[4.0, 4.0], [6.0, 4.0], [6.0, 6.0], [4.0, 6.0], [4.0, 4.0]])
+
+        packed = pack_polygons([[triangle], [l_shape[::-1]], [square, hole], [np.array([[1.0, 1.0], [1.0, 1.0]])]])
+
+        side = (0.5 + 0.5 * math.sqrt(2.0)) / (2.0 + math.sqrt(2.0))
+        np.testing.assert_allclose(centroids_batch(*packed)[:3], [[side, side], [0.875, 0.875], [17.0 / 3, 17.0 / 3]])
+
+        area = centroids_batch(*packed, weight='area')
+        np.testing.assert_allclose(area[:3], [[1.0 / 3, 1.0 / 3], [5.0 / 6, 5.0 / 6], [19.0 / 3, 19.0 / 3]])
+        self.assertTrue(np.isnan(area[3]).all())
+
+        # triangle and L-shape as one multipolygon
+        np.testing.assert_allclose(centroids_batch(*packed, weight='area', geom_offsets=[0, 2, 3, 4])[0],
+                                   [(0.5 / 3 + 2.5) / 3.5] * 2)
+
+        with self.assertRaises(ValueError):
+            centroids_batch(*packed, weight='volume')
+
+    def test_centroids_projected(self):
+
+        coords, ring_offsets, poly_offsets = self.packed
+        shifted = centroids_batch(coords + [4500000.0, 5600000.0], ring_offsets, poly_offsets, weight='area')
+
+        np.testing.assert_allclose(shifted - [4500000.0, 5600000.0],
+                                   centroids_batch(coords, ring_offsets, poly_offsets, weight='area'), atol=1e-8)
+
+
+    def test_affine_matrix(self):
+
+        matrix = affine_matrix((1.0, 2.0), shift=(3.0, -1.0), angle=90, scale=2.0)
+
+        # center moves to (4, 1), the point one unit right of it ends two units above it
+        np.testing.assert_allclose(matrix @ [2.0, 2.0, 1.0], [4.0, 3.0, 1.0], atol=1e-12)
+        np.testing.assert_allclose(matrix @ [1.0, 2.0, 1.0], [4.0, 1.0, 1.0], atol=1e-12)
+
+        self.assertEqual(affine_matrix(np.zeros((4, 2)), angle=[0, 90, 180, 270]).shape, (4, 3, 3))
+        np.testing.assert_array_equal(affine_matrix((5.0, 5.0)), np.eye(3))
+
+    def test_transform_packed(self):
+
+        coords, ring_offsets, poly_offsets = self.packed
+        shifts = np.array([[1.0, 2.0], [0.0, 0.0], [-5.0, 3.0], [2.5, 2.5]])
+        angles = np.array([30.0, 0.0, -45.0, 120.0])
+
+        result = transform_packed(coords, ring_offsets, poly_offsets, shift=shifts, angle=angles, scale=1.5)
+
+        centers = centroids_batch(result, ring_offsets, poly_offsets)
+        np.testing.assert_allclose(centers, centroids_batch(*self.packed) + shifts, rtol=1e-9)
+
+        table = moment_tables_batch(result, ring_offsets, poly_offsets)
+        np.testing.assert_allclose(table.raw[:, 0, 0], moment_tables_batch(*self.packed).raw[:, 0, 0] * 1.5, rtol=1e-9)
+
+        # in place, one multipolygon of the first two polygons
+        inplace = coords.copy()
+        transform_packed(inplace, ring_offsets, poly_offsets, angle=90, geom_offsets=[0, 2, 3, 4], out=inplace)
+        center = centroids_batch(coords, ring_offsets, poly_offsets, geom_offsets=[0, 2, 3, 4])[0]
+
+        np.testing.assert_allclose(inplace[0], center + [center[1] - coords[0, 1], coords[0, 0] - center[0]], rtol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,226 @@
+"""
+Caches of per-geometry results keyed by the digest of the geometry WKB.
+
+MomentCache - persistent, entries live in a SQLite file, every entry remembers the tick of its last use,
+              the least recently used entries are evicted when the cache outgrows max_entries.
+ResultMemo  - bounded in-process LRU memo of Moment results.
+"""
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from collections import namedtuple, OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1000000
+DEFAULT_MEMO_SIZE = 4096
+
+# sqlite limits the number of host parameters of a statement
+_QUERY_CHUNK = 500
+
+CacheStats = namedtuple('CacheStats', 'hits,misses,evictions,size')
+
+
+def wkb_digest(wkb):
+
+    """
+    :param wkb: bytes of WKB geometry
+    :return: 16 bytes digest
+    """
+
+    return hashlib.blake2b(bytes(wkb), digest_size=16).digest()
+
+
+class MomentCache:
+
+    """
+    Content-addressed SQLite cache of result rows.
+    :param path: database file, ':memory:' for a temporary cache
+    :param kind: name of the cached result, rows of different kinds never collide
+    :param max_entries: size limit, least recently used entries above it are evicted
+    """
+
+    def __init__(self, path, kind='perimeter_hu', max_entries=DEFAULT_MAX_ENTRIES):
+
+        self.kind = kind
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS moments ('
+                                 'kind TEXT NOT NULL, digest BLOB NOT NULL, value BLOB NOT NULL, '
+                                 'last_used INTEGER NOT NULL, PRIMARY KEY (kind, digest))')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS moments_last_used ON moments (last_used)')
+
+        self._tick, = self._connection.execute('SELECT COALESCE(MAX(last_used), 0) FROM moments').fetchone()
+
+    def __len__(self):
+
+        count, = self._connection.execute('SELECT COUNT(*) FROM moments').fetchone()
+        return count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def stats(self):
+
+        """
+        :rtype: CacheStats
+        """
+
+        return CacheStats(self.hits, self.misses, self.evictions, len(self))
+
+    def close(self):
+
+        self._connection.commit()
+        self._connection.close()
+
+    def get_many(self, digests):
+
+        """
+        Looks up digests and marks found entries as recently used
+        :return: dict digest -> (K,) float64 array
+        """
+
+        self._tick += 1
+        found = {}
+        unique = list(dict.fromkeys(digests))
+
+        for start in range(0, len(unique), _QUERY_CHUNK):
+
+            chunk = unique[start:start + _QUERY_CHUNK]
+            rows = self._connection.execute(
+                'SELECT digest, value FROM moments WHERE kind = ? AND digest IN ({})'.format(','.join('?' * len(chunk))),
+                (self.kind, *chunk))
+
+            found.update((bytes(digest), np.frombuffer(value, dtype=np.float64)) for digest, value in rows)
+
+        self._connection.executemany('UPDATE moments SET last_used = ? WHERE kind = ? AND digest = ?',
+                                     ((self._tick, self.kind, digest) for digest in found))
+
+        return found
+
+    def put_many(self, digests, rows):
+
+        """
+        Stores result rows and evicts the least recently used entries above max_entries
+        :param rows: (N, K) array
+        """
+
+        self._tick += 1
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+
+        with self._connection:
+
+            self._connection.executemany('INSERT OR REPLACE INTO moments VALUES (?, ?, ?, ?)',
+                                         ((self.kind, digest, row.tobytes(), self._tick)
+                                          for digest, row in zip(digests, rows)))
+
+            excess = len(self) - self.max_entries
+
+            if excess > 0:
+                self._connection.execute('DELETE FROM moments WHERE rowid IN '
+                                         '(SELECT rowid FROM moments ORDER BY last_used LIMIT ?)', (excess,))
+                self.evictions += excess
+
+    def compute(self, wkbs, function):
+
+        """
+        Returns cached rows of the geometries, function is called once for the geometries not found
+        :param wkbs: list of WKB geometries
+        :param function: maps list of WKB to (M, K) array of result rows
+        :return: (N, K) array
+        """
+
+        digests = [wkb_digest(wkb) for wkb in wkbs]
+        found = self.get_many(digests)
+
+        missing = {}
+        for digest, wkb in zip(digests, wkbs):
+            if digest in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing.setdefault(digest, wkb)
+
+        if missing:
+            rows = np.asarray(function(list(missing.values())), dtype=np.float64)
+            self.put_many(list(missing), rows)
+            found.update(zip(missing, rows))
+
+        if not digests:
+            return np.empty((0, 0))
+
+        return np.stack([found[digest] for digest in digests])
+
+
+class ResultMemo:
+
+    """
+    Bounded LRU memo shared by Moment instances, see Moment.enable_memo.
+    Keys are tuples of geometry digest, name of the result and its arguments.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MEMO_SIZE):
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    @property
+    def stats(self):
+
+        """
+        :rtype: CacheStats
+        """
+
+        return CacheStats(self.hits, self.misses, self.evictions, len(self))
+
+    @property
+    def hit_rate(self):
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def get_or_compute(self, key, function):
+
+        """
+        Returns the memoized result of key, function() is called on a miss and its result is stored
+        """
+
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+
+        result = function()
+
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self.evictions += 1
+
+        return result
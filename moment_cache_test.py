@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from moment_batch import compute_perimeter_hu_batch
+from moment_cache import MomentCache, ResultMemo, wkb_digest
+from wkb_reader import pack_wkb
+
+
+def polygon_wkb(points):
+
+    points = np.asarray(points + points[:1], dtype='<f8')
+    return b'\x01' + np.array([3, 1, len(points)], dtype='<u4').tobytes() + points.tobytes()
+
+
+class MomentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.wkbs = [polygon_wkb([(0, 0), (5, 1), (6, 4), (2, 7), (-1, 3)]),
+                     polygon_wkb([(0, 0), (4, 0), (4, 4), (0, 4)]),
+                     polygon_wkb([(1, 1), (3, 1), (2, 5)])]
+        self.calls = []
+
+    def compute(self, wkbs):
+
+        self.calls.append(len(wkbs))
+        return compute_perimeter_hu_batch(*pack_wkb(wkbs))
+
+    def test_hits_and_misses(self):
+
+        with MomentCache(':memory:') as cache:
+
+            first = cache.compute(self.wkbs, self.compute)
+            second = cache.compute(self.wkbs[1:] + self.wkbs[1:], self.compute)
+
+            self.assertEqual(self.calls, [3])
+
+            np.testing.assert_array_equal(first, compute_perimeter_hu_batch(*pack_wkb(self.wkbs)))
+            np.testing.assert_array_equal(second, np.concatenate((first[1:], first[1:])))
+            self.assertEqual(cache.stats, (4, 3, 0, 3))
+
+    def test_changed_geometry(self):
+
+        with MomentCache(':memory:') as cache:
+
+            cache.compute(self.wkbs, self.compute)
+            changed = polygon_wkb([(0, 0), (5, 1), (6, 4), (2, 7), (-1, 4)])
+            cache.compute([changed] + self.wkbs[1:], self.compute)
+
+            self.assertEqual(self.calls, [3, 1])
+            self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_lru_eviction(self):
+
+        with MomentCache(':memory:', max_entries=2) as cache:
+
+            cache.compute(self.wkbs[:2], self.compute)
+            cache.compute(self.wkbs[:1], self.compute)
+            cache.compute(self.wkbs[2:], self.compute)
+
+            self.assertEqual(cache.evictions, 1)
+            self.assertEqual(set(cache.get_many([wkb_digest(wkb) for wkb in self.wkbs])),
+                             {wkb_digest(self.wkbs[0]), wkb_digest(self.wkbs[2])})
+
+    def test_persistent(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            path = os.path.join(tmp_dir, 'cache.sqlite')
+
+            with MomentCache(path) as cache:
+                expected = cache.compute(self.wkbs, self.compute)
+
+            with MomentCache(path) as cache:
+                np.testing.assert_array_equal(cache.compute(self.wkbs, self.compute), expected)
+                self.assertEqual((cache.hits, cache.misses), (3, 0))
+
+            with MomentCache(path, kind='other') as cache:
+                cache.compute(self.wkbs, self.compute)
+                self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+
+class ResultMemoTest(unittest.TestCase):
+
+    def test_lru(self):
+
+        memo = ResultMemo(maxsize=2)
+
+        for key in ['a', 'b', 'a', 'c', 'b']:
+            memo.get_or_compute(key, key.upper)
+
+        self.assertEqual(memo.stats, (1, 4, 2, 2))
+        self.assertEqual(memo.hit_rate, 0.2)
+        self.assertEqual(memo.get_or_compute('c', lambda: None), 'C')
+
+        memo.clear()
+        self.assertEqual(memo.stats, (0, 0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
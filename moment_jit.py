@@ -0,0 +1,141 @@
+"""
+Optional Numba kernels of contour moments.
+
+The kernels compute the moment table about a local origin in one fused loop over segments,
+without the (M, P, P) intermediate arrays of moment_numpy.segment_moment_table.
+They are compiled with nogil, so threads may run them in parallel.
+Without numba the kernels stay plain python functions: the results are the same, but they are
+slow, so Moment and moment_batch use them only when ENABLED, which is true when numba is installed.
+"""
+import math
+import numpy as np
+from moment_numpy import binomial_matrix
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+HAVE_NUMBA = njit is not None
+
+# Moment and moment_batch switch to the kernels when it is true
+ENABLED = HAVE_NUMBA
+
+
+def _jit(function):
+
+    if njit is None:
+        return function
+
+    return njit(nogil=True, cache=True)(function)
+
+
+@_jit
+def _add_segment(x0, y0, dx, dy, binomials, expansion_x, expansion_y, table):
+
+    # table[p, q] += length * sum(X[p, a] * Y[q, b] / (a + b + 1)), X[p, a] = C(p, a) * x0^(p-a) * dx^a
+    order = table.shape[0] - 1
+    length = math.sqrt(dx * dx + dy * dy)
+
+    for p in range(order + 1):
+        for a in range(p + 1):
+            expansion_x[p, a] = binomials[p, a] * x0 ** (p - a) * dx ** a
+            expansion_y[p, a] = binomials[p, a] * y0 ** (p - a) * dy ** a
+
+    for p in range(order + 1):
+        for q in range(order + 1):
+            total = 0.0
+            for a in range(p + 1):
+                partial = 0.0
+                for b in range(q + 1):
+                    partial += expansion_y[q, b] / (a + b + 1.0)
+                total += expansion_x[p, a] * partial
+            table[p, q] += total * length
+
+
+@_jit
+def _segments_kernel(starts, ends, binomials, table):
+
+    order = table.shape[0] - 1
+    expansion_x = np.zeros((order + 1, order + 1))
+    expansion_y = np.zeros((order + 1, order + 1))
+
+    for k in range(starts.shape[0]):
+        dx = ends[k, 0] - starts[k, 0]
+        dy = ends[k, 1] - starts[k, 1]
+        if dx != 0.0 or dy != 0.0:
+            _add_segment(starts[k, 0], starts[k, 1], dx, dy, binomials, expansion_x, expansion_y, table)
+
+
+@_jit
+def _packed_kernel(coords, ring_offsets, ring_poly, binomials, origins, tables):
+
+    order = tables.shape[1] - 1
+    expansion_x = np.zeros((order + 1, order + 1))
+    expansion_y = np.zeros((order + 1, order + 1))
+
+    poly_count = origins.shape[0]
+    lower = np.full((poly_count, 2), np.inf)
+    upper = np.full((poly_count, 2), -np.inf)
+
+    # origin is the bounding box center of starts of non-degenerate segments, as in moment_batch
+    for r in range(ring_offsets.shape[0] - 1):
+        poly = ring_poly[r]
+        for k in range(ring_offsets[r], ring_offsets[r + 1] - 1):
+            if coords[k, 0] != coords[k + 1, 0] or coords[k, 1] != coords[k + 1, 1]:
+                for axis in range(2):
+                    lower[poly, axis] = min(lower[poly, axis], coords[k, axis])
+                    upper[poly, axis] = max(upper[poly, axis], coords[k, axis])
+
+    for poly in range(poly_count):
+        for axis in range(2):
+            if lower[poly, axis] <= upper[poly, axis]:
+                origins[poly, axis] = (lower[poly, axis] + upper[poly, axis]) / 2.0
+
+    for r in range(ring_offsets.shape[0] - 1):
+        poly = ring_poly[r]
+        for k in range(ring_offsets[r], ring_offsets[r + 1] - 1):
+            dx = coords[k + 1, 0] - coords[k, 0]
+            dy = coords[k + 1, 1] - coords[k, 1]
+            if dx != 0.0 or dy != 0.0:
+                _add_segment(coords[k, 0] - origins[poly, 0], coords[k, 1] - origins[poly, 1], dx, dy,
+                             binomials, expansion_x, expansion_y, tables[poly])
+
+
+def local_moment_table(starts, ends, order):
+
+    """
+    Integrals of x^p * y^q along the contour for all p, q <= order,
+    the fused equivalent of segment_moment_table(starts, ends, order).sum(axis=0)
+    :param starts: (M, 2) array of segment start points
+    :param ends: (M, 2) array of segment end points
+    :return: (order + 1, order + 1) array
+    """
+
+    table = np.zeros((order + 1, order + 1))
+    _segments_kernel(np.ascontiguousarray(starts, dtype=np.float64), np.ascontiguousarray(ends, dtype=np.float64),
+                     np.ascontiguousarray(binomial_matrix(order)), table)
+
+    return table
+
+
+def packed_local_tables(coords, ring_offsets, poly_offsets, order):
+
+    """
+    Moment tables of every polygon of the packed layout about the bounding box center of the polygon
+    :return: (P, order + 1, order + 1) array of local tables, (P, 2) array of origins
+    """
+
+    coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+    ring_offsets = np.ascontiguousarray(ring_offsets, dtype=np.int64)
+    poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+
+    poly_count = len(poly_offsets) - 1
+    ring_poly = np.repeat(np.arange(poly_count, dtype=np.int64), np.diff(poly_offsets))
+
+    origins = np.zeros((poly_count, 2))
+    tables = np.zeros((poly_count, order + 1, order + 1))
+
+    _packed_kernel(coords, ring_offsets, ring_poly, np.ascontiguousarray(binomial_matrix(order)), origins, tables)
+
+    return tables, origins
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import moment_jit
+from moment_batch import pack_polygons, moment_tables_batch
+from moment_numpy import ring_segments, segment_moment_table
+
+
+class MomentJitTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.polygons = [[np.array([[-2.0, -2.0], [2.0, -2.0], [2.0, 2.0], [-2.0, 2.0], [-2.0, -2.0]]),
+                          np.array([[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0], [-1.0, 1.0], [-1.0, -1.0]])],
+                         [np.array([[0.0, 0.0], [5.0, 1.0], [6.0, 4.0], [6.0, 4.0], [2.0, 7.0], [0.0, 0.0]])],
+                         [],
+                         [np.array([[4500000.0, 5600000.0], [4500020.0, 5600003.0], [4500011.0, 5600017.0],
+                                    [4500000.0, 5600000.0]])]]
+
+        self.enabled = moment_jit.ENABLED
+
+    def tearDown(self):
+
+        moment_jit.ENABLED = self.enabled
+
+    def test_local_moment_table(self):
+
+        starts, ends = ring_segments(self.polygons[1])
+
+        for order in (1, 3, 6):
+            with self.subTest(order=order):
+                np.testing.assert_allclose(moment_jit.local_moment_table(starts, ends, order),
+                                           segment_moment_table(starts, ends, order).sum(axis=0), rtol=1e-12)
+
+    def test_packed_local_tables(self):
+
+        packed = pack_polygons(self.polygons)
+
+        moment_jit.ENABLED = False
+        expected = moment_tables_batch(*packed, max_order=4)
+
+        moment_jit.ENABLED = True
+        result = moment_tables_batch(*packed, max_order=4)
+
+        for table, expected_table in zip(result, expected):
+            np.testing.assert_allclose(table, expected_table, rtol=1e-10, atol=1e-12)
+
+        tables, origins = moment_jit.packed_local_tables(*packed, 2)
+        self.assertTrue((tables[2] == 0).all())
+        np.testing.assert_array_equal(origins[3], [4500010.0, 5600008.5])
+
+    @unittest.skipUnless(moment_jit.HAVE_NUMBA, 'numba is not installed')
+    def test_threads(self):
+
+        coords, ring_offsets, poly_offsets = pack_polygons(self.polygons * 1000)
+        expected = moment_jit.packed_local_tables(coords, ring_offsets, poly_offsets, 3)[0]
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda _: moment_jit.packed_local_tables(coords, ring_offsets, poly_offsets, 3)[0],
+                                        range(8)))
+
+        for tables in results:
+            np.testing.assert_array_equal(tables, expected)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
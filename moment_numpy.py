@@ -0,0 +1,213 @@
+import math
+import numpy as np
+from collections import namedtuple
+from polynome import BINOMIALS, MAX_POWER
+
+MomentTable = namedtuple('MomentTable', 'raw,central,normalized')
+
+
+def ring_segments(rings):
+
+    """
+    Joins consecutive vertices of every ring into segments, zero-length segments are dropped
+    :param rings: list of (N, 2) float64 arrays of ring vertices
+    :return: (starts, ends) - two (M, 2) float64 arrays
+    """
+
+    starts = [ring[:-1] for ring in rings if len(ring) > 1]
+    ends = [ring[1:] for ring in rings if len(ring) > 1]
+
+    if not starts:
+        return np.empty((0, 2)), np.empty((0, 2))
+
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+
+    valid = np.any(starts != ends, axis=1)
+
+    return starts[valid], ends[valid]
+
+
+def binomial_matrix(order):
+
+    """
+    Returns (order + 1, order + 1) matrix C with C[p, a] = binom(p, a), zero for a > p
+    """
+
+    if order <= MAX_POWER:
+        return BINOMIALS[:order + 1, :order + 1]
+
+    return np.array([[math.comb(p, a) for a in range(order + 1)] for p in range(order + 1)], dtype=np.float64)
+
+
+def _expansion_matrices(base, delta, order):
+
+    """
+    Returns matrices E[..., p, a] = C(p, a) * base^(p-a) * delta^a, coefficients of (base + delta * t)^p
+    """
+
+    powers = np.arange(order + 1)
+    exponents = np.clip(powers[:, None] - powers[None, :], 0, None)
+
+    base_powers = np.asarray(base, dtype=np.float64)[..., None] ** powers
+    delta_powers = np.asarray(delta, dtype=np.float64)[..., None] ** powers
+
+    return binomial_matrix(order) * base_powers[..., exponents] * delta_powers[..., None, :]
+
+
+def segment_moment_table(starts, ends, order):
+
+    """
+    Computes integrals of x^p * y^q along each segment for all p, q <= order
+    :param starts: (M, 2) array of segment start points
+    :param ends: (M, 2) array of segment end points
+    :param order: max power of x and y
+    :return: (M, order + 1, order + 1) array of segment moments
+    """
+
+    powers = np.arange(order + 1)
+    weights = 1.0 / (powers[:, None] + powers[None, :] + 1.0)
+
+    delta = ends - starts
+
+    a = _expansion_matrices(starts[:, 0], delta[:, 0], order)
+    b = _expansion_matrices(starts[:, 1], delta[:, 1], order)
+
+    length = np.hypot(delta[:, 0], delta[:, 1])
+
+    return np.matmul(np.matmul(a, weights) * length[:, None, None], np.swapaxes(b, -1, -2))
+
+
+def shift_moment_table(table, dx, dy):
+
+    """
+    Re-expresses moments after translation of the contour by (dx, dy):
+    m'[p, q] = sum(C(p, a) * dx^(p-a) * C(q, b) * dy^(q-b) * m[a, b])
+    :param table: (..., P, P) array of moments
+    :param dx: scalar or array broadcastable to table.shape[:-2]
+    :param dy: scalar or array broadcastable to table.shape[:-2]
+    :return: (..., P, P) array
+    """
+
+    order = table.shape[-1] - 1
+
+    tx = _expansion_matrices(dx, 1.0, order)
+    ty = _expansion_matrices(dy, 1.0, order)
+
+    return np.matmul(np.matmul(tx, table), np.swapaxes(ty, -1, -2))
+
+
+def normalize_moment_table(central):
+
+    """
+    Scale normalization of central contour moments: eta[p, q] = mu[p, q] / mu[0, 0]^(p + q + 1)
+    :param central: (..., P, P) array of central moments
+    """
+
+    powers = np.arange(central.shape[-1])
+    m00 = central[..., 0, 0][..., None, None]
+
+    return central / m00 ** (powers[:, None] + powers[None, :] + 1)
+
+
+def complete_moment_table(local, origin):
+
+    """
+    Builds raw, central and normalized moments from moments of contour about the given origin
+    :param local: (..., P, P) array of moments about origin
+    :param origin: (..., 2) array
+    :rtype: MomentTable
+    """
+
+    origin = np.asarray(origin, dtype=np.float64)
+    m00 = local[..., 0, 0]
+
+    raw = shift_moment_table(local, origin[..., 0], origin[..., 1])
+    central = shift_moment_table(local, -local[..., 1, 0] / m00, -local[..., 0, 1] / m00)
+
+    return MomentTable(raw, central, normalize_moment_table(central))
+
+
+def rotate_moment_table(central, angle):
+
+    """
+    Central moments of contour rotated counterclockwise by angle about its centroid:
+    x' = cos * x - sin * y, y' = sin * x + cos * y, expanded with the binomial theorem.
+    Moments of order p + q mix only with moments of the same order p + q, so
+    the result is a table of half the order of the input.
+    :param central: (P, P) array of central moments
+    :param angle: radians
+    :return: ((P - 1) // 2 + 1, (P - 1) // 2 + 1) array
+    """
+
+    order = (central.shape[-1] - 1) // 2
+    binomials = binomial_matrix(order)
+    cos, sin = math.cos(angle), math.sin(angle)
+
+    result = np.zeros((order + 1, order + 1))
+
+    for p in range(order + 1):
+        for q in range(order + 1):
+            for a in range(p + 1):
+                for b in range(q + 1):
+                    result[p, q] += (binomials[p, a] * binomials[q, b] * cos ** a * (-sin) ** (p - a) *
+                                     sin ** b * cos ** (q - b) * central[a + b, p + q - a - b])
+
+    return result
+
+
+def transform_moment_table(table, shift=(0.0, 0.0), angle=0.0, scale=1.0):
+
+    """
+    Moments of contour translated by shift, then rotated by angle and scaled about its centroid,
+    derived from the moments of the original contour without touching the segments
+    :param table: MomentTable, its order must be twice the order of the result when angle is not zero
+    :param angle: radians, counterclockwise
+    :return: MomentTable
+    """
+
+    m00 = table.raw[0, 0]
+    centroid = (table.raw[1, 0] / m00 + shift[0], table.raw[0, 1] / m00 + shift[1])
+
+    if angle:
+        central = rotate_moment_table(table.central, angle)
+    else:
+        central = table.central
+
+    powers = np.arange(central.shape[-1])
+    central = central * float(scale) ** (powers[:, None] + powers[None, :] + 1)
+
+    return MomentTable(shift_moment_table(central, centroid[0], centroid[1]), central, normalize_moment_table(central))
+
+
+def hu_moments(moments):
+
+    """
+    Computes seven hu-moments from central (or normalized central) moments
+    :param moments: (..., P, P) array of moments, P >= 4
+    :return: (..., 7) array
+    """
+
+    f20 = moments[..., 2, 0]
+    f02 = moments[..., 0, 2]
+    f11 = moments[..., 1, 1]
+    f30 = moments[..., 3, 0]
+    f03 = moments[..., 0, 3]
+    f12 = moments[..., 1, 2]
+    f21 = moments[..., 2, 1]
+
+    # intermediates shared by the third order invariants
+    s1 = f30 + f12
+    s2 = f21 + f03
+    d1 = f30 - 3 * f12
+    d2 = 3 * f21 - f03
+
+    return np.stack([
+        f20 + f02,
+        (f20 - f02) ** 2 + 4 * f11 ** 2,
+        d1 ** 2 + d2 ** 2,
+        s1 ** 2 + s2 ** 2,
+        d1 * s1 * (s1 ** 2 - 3 * s2 ** 2) + d2 * s2 * (3 * s1 ** 2 - s2 ** 2),
+        (f20 - f02) * (s1 ** 2 - s2 ** 2) + 4 * f11 * s1 * s2,
+        d2 * s1 * (s1 ** 2 - 3 * s2 ** 2) - d1 * s2 * (3 * s1 ** 2 - s2 ** 2),
+    ], axis=-1)
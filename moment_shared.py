@@ -0,0 +1,103 @@
+"""
+Multi-process moment computation over a packed layer kept in multiprocessing.shared_memory.
+Workers get zero-copy views of the coordinate buffer and write into a shared result matrix,
+only block names and polygon ranges are pickled.
+"""
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from moment_batch import compute_perimeter_hu_batch
+
+DEFAULT_CHUNK_SIZE = 4096
+
+# perimeter and seven hu-moments
+RESULT_COLUMNS = 8
+
+
+def _share(array):
+
+    """
+    Copies array into a new shared memory block
+    :return: SharedMemory, descriptor to attach the block in another process
+    """
+
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(descriptor):
+
+    """
+    Attaches shared memory block created by _share
+    :return: SharedMemory, numpy view of the block
+    """
+
+    name, shape, dtype = descriptor
+    shm = SharedMemory(name=name)
+
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def compute_range(coords, ring_offsets, poly_offsets, start, stop):
+
+    """
+    Computes perimeter and hu-moments of polygons [start, stop) of the packed layer without copying coordinates
+    :return: (stop - start, 8) array
+    """
+
+    first_ring, last_ring = poly_offsets[start], poly_offsets[stop]
+
+    return compute_perimeter_hu_batch(coords, ring_offsets[first_ring:last_ring + 1],
+                                      poly_offsets[start:stop + 1] - first_ring)
+
+
+def _worker(args):
+
+    coords_desc, ring_desc, poly_desc, result_desc, start, stop = args
+
+    blocks = [_attach(desc) for desc in (coords_desc, ring_desc, poly_desc, result_desc)]
+    (_, coords), (_, ring_offsets), (_, poly_offsets), (_, result) = blocks
+
+    result[start:stop] = compute_range(coords, ring_offsets, poly_offsets, start, stop)
+
+    del coords, ring_offsets, poly_offsets, result
+    for shm, _ in blocks:
+        shm.close()
+
+
+def compute_shared(coords, ring_offsets, poly_offsets, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    """
+    Computes perimeter and hu-moments of every polygon of the packed layer in a process pool,
+    coordinates and results live in shared memory
+    :param workers: number of processes, os.cpu_count() by default
+    :param chunk_size: number of polygons per task
+    :return: (P, 8) array
+    """
+
+    coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+    ring_offsets = np.ascontiguousarray(ring_offsets, dtype=np.int64)
+    poly_offsets = np.ascontiguousarray(poly_offsets, dtype=np.int64)
+
+    poly_count = len(poly_offsets) - 1
+
+    blocks = [_share(coords), _share(ring_offsets), _share(poly_offsets),
+              _share(np.full((poly_count, RESULT_COLUMNS), np.nan))]
+
+    try:
+        descriptors = [desc for _, desc in blocks]
+        tasks = [(*descriptors, start, min(start + chunk_size, poly_count))
+                 for start in range(0, poly_count, chunk_size)]
+
+        with Pool(workers) as pool:
+            pool.map(_worker, tasks)
+
+        result_shm, (_, shape, dtype) = blocks[-1]
+        return np.ndarray(shape, dtype=dtype, buffer=result_shm.buf).copy()
+
+    finally:
+        for shm, _ in blocks:
+            shm.close()
+            shm.unlink()
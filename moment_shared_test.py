@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from moment_batch import pack_polygons, compute_perimeter_hu_batch
+from moment_shared import compute_shared, compute_range
+
+
+class MomentSharedTest(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.RandomState(7)
+        polygons = []
+
+        for k in range(37):
+
+            angles = np.sort(rng.uniform(0, 2 * np.pi, 6 + k % 5))
+            radius = rng.uniform(5, 20, len(angles))
+            ring = np.column_stack((4500000 + k * 50 + radius * np.cos(angles), 5600000 + radius * np.sin(angles)))
+            polygons.append([np.vstack((ring, ring[:1]))])
+
+        self.packed = pack_polygons(polygons)
+        self.reference = compute_perimeter_hu_batch(*self.packed)
+
+    def test_compute_range(self):
+
+        np.testing.assert_allclose(compute_range(*self.packed, 10, 20), self.reference[10:20], rtol=1e-12)
+
+    def test_compute_shared(self):
+
+        result = compute_shared(*self.packed, workers=3, chunk_size=5)
+
+        np.testing.assert_allclose(result, self.reference, rtol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -1,3 +1,4 @@
+import math
 import os
 import unittest
 import ogr
@@ -158,6 +159,163 @@ class MomentTest(unittest.TestCase):
             m2 = Moment(transform_geom(self.geometries[0], angle=30.0, scale=0.8))
             self.assertNotAlmostEqual(m1.compute(3, 3, scale_inv=True), m2.compute(3, 3, scale_inv=True))
 
+    def test_numpy_backend(self):
+
+        wkts = ['POLYGON((-2 -2, 2 -2, 2 2, -2 2, -2 -2), (-1 -1, 1 -1, 1 1, -1 1, -1 -1))',
+                'POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))']
+
+        geometries = [ogr.CreateGeometryFromWkt(wkt) for wkt in wkts]
+        geometries.append(transform_geom(geometries[1], shift=(3.5, -1.2), angle=17, scale=1.3))
+
+        moment_indexes = [(i, j) for i in range(7) for j in range(7)]
+
+        for k, geom in enumerate(geometries):
+
+            m1 = Moment(geom, backend='polynome')
+            m2 = Moment(geom, backend='numpy')
+
+            for i, j in moment_indexes:
+
+                for central in (False, True):
+
+                    with self.subTest(k=k, i=i, j=j, central=central, msg='numpy backend'):
+                        self.assertTrue(math.isclose(m1.compute(i, j, central=central),
+                                                     m2.compute(i, j, central=central), rel_tol=1e-9, abs_tol=1e-9))
+
+    def test_moment_table(self):
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))')
+
+        m = Moment(geom)
+        table = m.moment_table(max_order=5)
+
+        with self.subTest(msg='sliced from cached table'):
+            small = m.moment_table(max_order=2)
+            self.assertEqual(small.raw.shape, (3, 3))
+            self.assertTrue((small.central == table.central[:3, :3]).all())
+
+        reference = Moment(geom, backend='polynome')
+
+        for i in range(6):
+            for j in range(6):
+
+                with self.subTest(i=i, j=j, msg='table against polynome backend'):
+                    self.assertAlmostEqual(table.raw[i, j], reference.compute(i, j, central=False), delta=1e-9 * abs(table.raw[i, j]) + 1e-9)
+                    self.assertAlmostEqual(table.central[i, j], reference.compute(i, j, central=True), delta=1e-9 * abs(table.central[i, j]) + 1e-9)
+                    self.assertAlmostEqual(table.normalized[i, j], reference.compute(i, j, scale_inv=True))
+
+    def test_hu_moment_all(self):
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))')
+
+        m1 = Moment(geom)
+
+        for scale_inv in (True, False):
+
+            hu = m1.compute_hu_all(scale_inv=scale_inv)
+
+            self.assertEqual(len(hu), 7)
+
+            for i in range(7):
+
+                with self.subTest(i=i, scale_inv=scale_inv, msg='same as single invariant'):
+                    self.assertEqual(hu[i], m1.compute_hu(i, scale_inv=scale_inv))
+
+        # invariants 3-7 are down to ~1e-13, so they are compared with relative tolerance
+        for angle in (0, 30, 77, 145, 260):
+
+            rotated = Moment(transform_geom(geom, shift=(1.0, 60.0), angle=angle, scale=0.4))
+
+            for i, (hu1, hu2) in enumerate(zip(m1.compute_hu_all(), rotated.compute_hu_all())):
+
+                with self.subTest(i=i, angle=angle, msg='hu-moment invariance'):
+                    self.assertTrue(math.isclose(hu1, hu2, rel_tol=1e-6), '{} != {}'.format(hu1, hu2))
+
+    def test_degenerate_segments(self):
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 5 1, 6 4, 0 0), (1 1, 2 1, 2 2, 2 2, 1 1))')
+
+        m = Moment(geom)
+
+        self.assertEqual(len(m.segments), 6)
+        self.assertEqual((m.segments[1][0].x, m.segments[1][0].y), (5.0, 1.0))
+        self.assertEqual((m.segments[1][1].x, m.segments[1][1].y), (6.0, 4.0))
+        self.assertAlmostEqual(m.compute(0, 0, central=False), Moment(geom, backend='polynome').compute(0, 0, central=False))
+
+    def test_multipolygon(self):
+
+        parts = ['((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))', '((10 10, 12 10, 12 13, 10 10), (10.5 10.2, 11.5 10.2, 11.5 11, 10.5 10.2))']
+
+        multipolygon = Moment(ogr.CreateGeometryFromWkt('MULTIPOLYGON({})'.format(', '.join(parts))))
+        polygons = [Moment(ogr.CreateGeometryFromWkt('POLYGON{}'.format(part))) for part in parts]
+
+        for i in range(4):
+            for j in range(4):
+
+                with self.subTest(i=i, j=j, msg='raw moments of parts are summed'):
+                    self.assertAlmostEqual(multipolygon.compute(i, j, central=False),
+                                           sum(m.compute(i, j, central=False) for m in polygons),
+                                           delta=1e-9 * abs(multipolygon.compute(i, j, central=False)))
+
+        with self.subTest(msg='same as from wkb'):
+            self.assertEqual(multipolygon.compute_hu_all(), Moment.from_wkb(multipolygon.geom.ExportToWkb()).compute_hu_all())
+
+        with self.subTest(msg='invalid geometry type'):
+            with self.assertRaises(TypeError):
+                Moment(ogr.CreateGeometryFromWkt('LINESTRING(0 0, 1 1)'))
+
+    def test_transformed(self):
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0), (1 2, 2 2, 2 3, 1 2))')
+
+        transforms = [dict(shift=(10.0, -200.0)), dict(angle=33), dict(scale=2.5),
+                      dict(shift=(1.0, 60.0), angle=-71.5, scale=0.4)]
+
+        m = Moment(geom)
+
+        for transform in transforms:
+
+            reference = Moment(transform_geom(geom, **transform)).moment_table(3)
+            table = m.transformed(**transform).moment_table(3)
+
+            for i in range(4):
+                for j in range(4):
+
+                    with self.subTest(i=i, j=j, msg=str(transform)):
+                        self.assertAlmostEqual(table.raw[i, j], reference.raw[i, j], delta=1e-9 * abs(reference.raw[i, j]) + 1e-9)
+                        self.assertAlmostEqual(table.central[i, j], reference.central[i, j], delta=1e-9 * abs(reference.central[i, j]) + 1e-9)
+                        self.assertAlmostEqual(table.normalized[i, j], reference.normalized[i, j])
+
+        with self.subTest(msg='order above max_order is not available'):
+            with self.assertRaises(ValueError):
+                m.transformed(angle=10, max_order=2).compute(3, 0)
+
+        with self.subTest(msg='hu-moments'):
+            for hu1, hu2 in zip(m.compute_hu_all(), m.transformed(shift=(5, 5), angle=120, scale=3).compute_hu_all()):
+                self.assertAlmostEqual(hu1, hu2)
+
+    def test_memo(self):
+
+        wkt = 'POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))'
+        memo = Moment.enable_memo(maxsize=2)
+
+        try:
+            expected = Moment(ogr.CreateGeometryFromWkt(wkt)).compute_hu_all()
+
+            self.assertEqual(Moment(ogr.CreateGeometryFromWkt(wkt)).compute_hu_all(), expected)
+            self.assertEqual(Moment.from_wkb(ogr.CreateGeometryFromWkt(wkt).ExportToWkb()).compute_hu(2), expected[2])
+            self.assertEqual(memo.stats, (2, 1, 0, 1))
+            self.assertAlmostEqual(memo.hit_rate, 2 / 3)
+
+            m = Moment(ogr.CreateGeometryFromWkt(wkt))
+            m.compute(2, 0, central=True)
+            m.compute(2, 0, central=False)
+            m.transformed(scale=2).compute(2, 0)
+
+            self.assertEqual(memo.stats, (2, 3, 1, 2))
+        finally:
+            Moment.disable_memo()
+
     def test_parallel_to_axes(self):
         pass
 
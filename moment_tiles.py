@@ -0,0 +1,266 @@
+"""
+Tiled batch job. The layer is partitioned into tiles by a spatial grid or by FID blocks,
+every tile is an independent unit with its own output part and completion marker:
+
+    output_dir/part_<tile>.<ext>       - results of the tile, any format of moment_writers
+    output_dir/part_<tile>.<ext>.done  - JSON marker written after the part is closed
+
+Tiles with a marker are skipped on rerun, so a crashed run resumes where it stopped,
+tiles may be spread over processes and the parts are merged at the end.
+"""
+import argparse
+import json
+import os
+import numpy as np
+import ogr
+from multiprocessing import Pool
+from collections import namedtuple
+from count_moments_in_shp import DEFAULT_CHUNK_SIZE, LayerQuery, open_layer, index_ranges, iter_index_range, \
+    iter_feature_chunks, compute_chunk
+from moment_writers import RESULT_FIELDS, open_writer, write_valid
+
+# name  - unique name of the tile, part file names are derived from it
+# query - LayerQuery pushed down to the driver
+# cell  - (min_x, min_y, max_x, max_y, last_column, last_row) of grid tiles, None for blocks.
+#         A feature belongs to the cell of its first vertex, so features crossing cell borders
+#         are computed once although the spatial filter passes them to every cell they touch.
+# index_range - (start, stop) feature indexes of blocks, stop of the last block is None, None for grid tiles
+Tile = namedtuple('Tile', 'name,query,cell,index_range')
+Tile.__new__.__defaults__ = (None,)
+
+
+def grid_tiles(input_path, columns, rows, query=None):
+
+    """
+    Splits extent of the layer (or bbox of the query) into columns x rows cells
+    :rtype: list
+    """
+
+    query = query or LayerQuery()
+
+    if query.bbox:
+        min_x, min_y, max_x, max_y = query.bbox
+    else:
+        ds, layer = open_layer(input_path, query)
+        min_x, max_x, min_y, max_y = layer.GetExtent()
+        layer = None
+        ds = None
+
+    # every edge is computed once, neighbouring cells share it exactly
+    xs = np.linspace(min_x, max_x, columns + 1).tolist()
+    ys = np.linspace(min_y, max_y, rows + 1).tolist()
+
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            x0, y0, x1, y1 = xs[column], ys[row], xs[column + 1], ys[row + 1]
+            tiles.append(Tile('r{:04d}_c{:04d}'.format(row, column), query._replace(bbox=(x0, y0, x1, y1)),
+                              (x0, y0, x1, y1, column == columns - 1, row == rows - 1)))
+
+    return tiles
+
+
+def fid_block_tiles(input_path, block_size, query=None):
+
+    """
+    Splits the layer into blocks of block_size consecutive features, the last block is open-ended.
+    Blocks are read by index (see count_moments_in_shp.iter_index_range), FID range filters would make
+    drivers like Shapefile scan the whole layer for every block
+    :rtype: list
+    """
+
+    query = query or LayerQuery()
+
+    return [Tile('f{:012d}'.format(start), query, None, (start, stop))
+            for start, stop in index_ranges(input_path, block_size, query)]
+
+
+def _first_vertex(geom):
+
+    while geom.GetGeometryCount():
+        geom = geom.GetGeometryRef(0)
+    return geom.GetPoint(0)[:2] if geom.GetPointCount() else None
+
+
+def _in_cell(geom, cell):
+
+    vertex = _first_vertex(geom)
+    if vertex is None:
+        return False
+
+    x, y = vertex
+    min_x, min_y, max_x, max_y, last_column, last_row = cell
+
+    return (min_x <= x and (x < max_x or last_column and x == max_x) and
+            min_y <= y and (y < max_y or last_row and y == max_y))
+
+
+def part_path(output_dir, tile, extension):
+
+    return os.path.join(output_dir, 'part_{}{}'.format(tile.name, extension))
+
+
+def is_done(output_dir, tile, extension):
+
+    return os.path.exists(part_path(output_dir, tile, extension) + '.done')
+
+
+def run_tile(input_path, output_dir, tile, extension='.npy', chunk_size=DEFAULT_CHUNK_SIZE):
+
+    """
+    Computes moments of features of the tile into its part, writes the completion marker at the end
+    :return: number of written features
+    """
+
+    path = part_path(output_dir, tile, extension)
+
+    if tile.index_range is None:
+        inDataSource, features = open_layer(input_path, tile.query)
+    else:
+        inDataSource, features = None, iter_index_range(input_path, tile.query, *tile.index_range)
+
+    writer = open_writer(path)
+
+    count = 0
+    try:
+        for fids, geometries in iter_feature_chunks(features, chunk_size):
+            if tile.cell is not None:
+                own = [k for k, geom in enumerate(geometries) if _in_cell(geom, tile.cell)]
+                fids, geometries = fids[own], [geometries[k] for k in own]
+                if not geometries:
+                    continue
+            count += write_valid(writer, fids, geometries, compute_chunk(geometries))
+    finally:
+        writer.close()
+
+    inDataSource = None
+
+    with open(path + '.done', 'w') as marker:
+        json.dump({'tile': tile.name, 'count': count}, marker)
+
+    return count
+
+
+def _run_tile(args):
+    return args[2].name, run_tile(*args)
+
+
+def run_tiled(input_path, output_dir, tiles, extension='.npy', workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    """
+    Runs every tile without completion marker, tiles are distributed over worker processes
+    :param workers: number of processes, tiles run in the current process when it is 1
+    :return: dict tile name -> number of written features of the tiles computed by this call
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(input_path, output_dir, tile, extension, chunk_size) for tile in tiles
+             if not is_done(output_dir, tile, extension)]
+
+    if workers == 1:
+        return dict(map(_run_tile, tasks))
+
+    with Pool(workers) as pool:
+        return dict(pool.imap_unordered(_run_tile, tasks))
+
+
+def _read_part(path):
+
+    """
+    Reads a part written by run_tile
+    :return: fids, list of ogr.Geometry (None for .npy parts), (N, 8) result
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.npy':
+        matrix = np.load(path)
+        return matrix[:, 0].astype(np.int64), [None] * len(matrix), matrix[:, 1:]
+
+    if extension in ('.parquet', '.arrow', '.feather'):
+        import pyarrow.parquet
+        import pyarrow.ipc
+
+        if extension == '.parquet':
+            table = pyarrow.parquet.read_table(path)
+        else:
+            table = pyarrow.ipc.open_file(path).read_all()
+
+        return (table.column('fid').to_numpy(), [ogr.CreateGeometryFromWkb(wkb) for wkb in table.column('geometry').to_pylist()],
+                np.column_stack([table.column(name).to_numpy() for name in RESULT_FIELDS]))
+
+    ds = ogr.Open(path, 0)
+    fids, geometries, rows = [], [], []
+    for feature in ds.GetLayer():
+        fids.append(feature.GetFID())
+        geometries.append(feature.GetGeometryRef().Clone())
+        rows.append([feature.GetField(name) for name in RESULT_FIELDS])
+    ds = None
+
+    return np.array(fids, dtype=np.int64), geometries, np.array(rows, dtype=np.float64).reshape(-1, len(RESULT_FIELDS))
+
+
+def merge_parts(output_dir, tiles, output_path):
+
+    """
+    Merges parts of all tiles into output_path in tile order, output format must be the format of the parts
+    :return: number of merged features
+    """
+
+    extension = os.path.splitext(output_path)[1].lower()
+    missing = [tile.name for tile in tiles if not is_done(output_dir, tile, extension)]
+
+    if missing:
+        raise ValueError('{} tiles are not completed, e.g. {}'.format(len(missing), missing[0]))
+
+    writer = open_writer(output_path)
+
+    count = 0
+    try:
+        for tile in tiles:
+            fids, geometries, result = _read_part(part_path(output_dir, tile, extension))
+            if len(fids):
+                writer.write(fids, geometries, result)
+                count += len(fids)
+    finally:
+        writer.close()
+
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Computes moments of a vector layer tile by tile, '
+                                                 'completed tiles are skipped on rerun')
+    parser.add_argument('input', help='input OGR datasource')
+    parser.add_argument('output_dir', help='directory of output parts and completion markers')
+    tiling = parser.add_mutually_exclusive_group(required=True)
+    tiling.add_argument('--grid', type=int, nargs=2, metavar=('COLUMNS', 'ROWS'), help='spatial grid over the layer extent')
+    tiling.add_argument('--fid-block', type=int, metavar='SIZE', help='number of consecutive features per tile')
+    parser.add_argument('--format', default='.npy', choices=('.npy', '.gpkg', '.shp', '.parquet', '.arrow'),
+                        help='format of the parts')
+    parser.add_argument('--layer', help='layer name, the first layer by default')
+    parser.add_argument('--where', help='OGR SQL attribute filter')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes running tiles')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--merge', help='merge all parts into this file when every tile is completed')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    query = LayerQuery(args.layer, args.where)
+
+    if args.grid:
+        tiles = grid_tiles(args.input, args.grid[0], args.grid[1], query)
+    else:
+        tiles = fid_block_tiles(args.input, args.fid_block, query)
+
+    counts = run_tiled(args.input, args.output_dir, tiles, args.format, args.workers, args.chunk_size)
+    print('{} of {} tiles computed, {} features written'.format(len(counts), len(tiles), sum(counts.values())))
+
+    if args.merge:
+        print('{} features merged into {}'.format(merge_parts(args.output_dir, tiles, args.merge), args.merge))
+
+
+if __name__ == '__main__':
+    main()
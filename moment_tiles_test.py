@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import ogr
+from gdal_helper import transform_geom
+from count_moments_in_shp import LayerQuery, run_streaming
+from moment_tiles import grid_tiles, fid_block_tiles, run_tiled, merge_parts, part_path, _in_cell
+
+
+class MomentTilesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, 'input.shp')
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))')
+
+        ds = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(self.input_path)
+        lay = ds.CreateLayer('input', geom_type=ogr.wkbPolygon)
+
+        # 6 x 5 features on a 10 unit lattice, every polygon crosses cell borders of a 4 x 3 grid
+        for i in range(30):
+            feature = ogr.Feature(lay.GetLayerDefn())
+            feature.SetGeometry(transform_geom(geom, shift=(10 * (i % 6), 10 * (i // 6)), angle=7 * i))
+            lay.CreateFeature(feature)
+
+        ds = None
+
+        self.expected_path = os.path.join(self.tmp_dir.name, 'expected.npy')
+        run_streaming(self.input_path, self.expected_path)
+
+    def tearDown(self):
+
+        self.tmp_dir.cleanup()
+
+    def assertMerged(self, tiles, output_dir):
+
+        merged_path = os.path.join(self.tmp_dir.name, 'merged.npy')
+        self.assertEqual(merge_parts(output_dir, tiles, merged_path), 30)
+
+        merged = np.load(merged_path)
+        expected = np.load(self.expected_path)
+
+        np.testing.assert_array_equal(merged[np.argsort(merged[:, 0])], expected)
+
+    def test_grid(self):
+
+        output_dir = os.path.join(self.tmp_dir.name, 'grid')
+        tiles = grid_tiles(self.input_path, 4, 3)
+
+        self.assertEqual(len(tiles), 12)
+        self.assertEqual(sum(run_tiled(self.input_path, output_dir, tiles, workers=2).values()), 30)
+        self.assertMerged(tiles, output_dir)
+
+    def test_fid_blocks(self):
+
+        output_dir = os.path.join(self.tmp_dir.name, 'fids')
+        tiles = fid_block_tiles(self.input_path, 8)
+
+        self.assertEqual([tile.index_range for tile in tiles], [(0, 8), (8, 16), (16, 24), (24, None)])
+        self.assertIsNone(tiles[0].query.fid_ranges)
+        self.assertEqual(run_tiled(self.input_path, output_dir, tiles),
+                         {'f000000000000': 8, 'f000000000008': 8, 'f000000000016': 8, 'f000000000024': 6})
+        self.assertMerged(tiles, output_dir)
+
+    def test_resume(self):
+
+        output_dir = os.path.join(self.tmp_dir.name, 'resume')
+        tiles = fid_block_tiles(self.input_path, 8)
+
+        run_tiled(self.input_path, output_dir, tiles[:2])
+
+        with self.assertRaises(ValueError):
+            merge_parts(output_dir, tiles, os.path.join(self.tmp_dir.name, 'merged.npy'))
+
+        # a crashed tile leaves its part without marker
+        os.remove(part_path(output_dir, tiles[1], '.npy') + '.done')
+
+        self.assertEqual(set(run_tiled(self.input_path, output_dir, tiles)), {tile.name for tile in tiles[1:]})
+        self.assertEqual(run_tiled(self.input_path, output_dir, tiles), {})
+        self.assertMerged(tiles, output_dir)
+
+    def test_grid_edges(self):
+
+        tiles = grid_tiles(None, 7, 3, LayerQuery(bbox=(0.1, -3.3, 1e6 + 0.7, 2.9)))
+        cells = [tile.cell for tile in tiles]
+
+        for row in range(3):
+            for column in range(6):
+                self.assertEqual(cells[row * 7 + column][2], cells[row * 7 + column + 1][0])
+        for column in range(7):
+            self.assertEqual(cells[column][3], cells[7 + column][1])
+
+        self.assertEqual((cells[0][0], cells[0][1], cells[-1][2], cells[-1][3]), (0.1, -3.3, 1e6 + 0.7, 2.9))
+
+    def test_in_cell(self):
+
+        geom = ogr.CreateGeometryFromWkt('MULTIPOLYGON(((10 0, 15 1, 16 4, 10 0)), ((0 0, 1 0, 1 1, 0 0)))')
+
+        self.assertTrue(_in_cell(geom, (10, 0, 20, 10, False, False)))
+        self.assertFalse(_in_cell(geom, (0, 0, 10, 10, False, False)))
+        self.assertTrue(_in_cell(geom, (0, 0, 10, 10, True, False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+Bulk writers of the batch job results. Every writer receives whole chunks:
+fids - (N,) int array, geometries - list of ogr.Geometry, result - (N, 8) array of perimeter and hu-moments.
+
+OgrWriter   - any OGR vector format, GeoPackage is written inside a single transaction
+ArrowWriter - Parquet (GeoParquet metadata, WKB geometry column) or Arrow IPC file, needs pyarrow
+NumpyWriter - .npy matrix, column 0 is the feature FID, the rest are the result columns, written incrementally
+"""
+import json
+import os
+import shutil
+import numpy as np
+import ogr
+
+RESULT_FIELDS = ['p', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6', 'm7']
+
+DRIVERS = {'.shp': 'ESRI Shapefile', '.gpkg': 'GPKG'}
+
+
+class OgrWriter:
+
+    """
+    Writes features with geometry and result fields into a new OGR datasource,
+    an existing datasource at path is replaced
+    """
+
+    def __init__(self, path, driver_name='ESRI Shapefile'):
+
+        driver = ogr.GetDriverByName(driver_name)
+        if os.path.exists(path):
+            driver.DeleteDataSource(path)
+
+        self.datasource = driver.CreateDataSource(path)
+
+        # shapefile layers can't mix polygons and multipolygons, others get generic geometry type
+        geom_type = ogr.wkbPolygon if driver_name == 'ESRI Shapefile' else ogr.wkbUnknown
+        self.layer = self.datasource.CreateLayer(os.path.splitext(os.path.basename(path))[0], geom_type=geom_type)
+
+        for name in RESULT_FIELDS:
+            self.layer.CreateField(ogr.FieldDefn(name, ogr.OFTReal))
+
+        defn = self.layer.GetLayerDefn()
+        self._field_indexes = [defn.GetFieldIndex(name) for name in RESULT_FIELDS]
+        self._keep_fids = driver_name != 'ESRI Shapefile'
+
+        self._transaction = self.datasource.TestCapability(ogr.ODsCTransactions)
+        if self._transaction:
+            self.datasource.StartTransaction()
+
+    def write(self, fids, geometries, result):
+
+        defn = self.layer.GetLayerDefn()
+
+        for fid, geom, row in zip(np.asarray(fids).tolist(), geometries, np.asarray(result).tolist()):
+            feature = ogr.Feature(defn)
+            if self._keep_fids:
+                feature.SetFID(fid)
+            feature.SetGeometry(geom)
+            for index, value in zip(self._field_indexes, row):
+                feature.SetField(index, value)
+            self.layer.CreateFeature(feature)
+
+    def close(self):
+
+        if self._transaction:
+            self.datasource.CommitTransaction()
+
+        self.layer = None
+        self.datasource = None
+
+
+class ArrowWriter:
+
+    """
+    Writes one record batch per chunk: fid, WKB geometry and result columns
+    :param file_format: 'parquet' or 'arrow'
+    """
+
+    def __init__(self, path, file_format='parquet'):
+
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('pyarrow is required to write {} files'.format(file_format))
+
+        self._pa = pyarrow
+
+        schema = pyarrow.schema([('fid', pyarrow.int64()), ('geometry', pyarrow.binary())] +
+                                [(name, pyarrow.float64()) for name in RESULT_FIELDS])
+
+        if file_format == 'parquet':
+            import pyarrow.parquet
+
+            geo = {'version': '1.0.0', 'primary_column': 'geometry',
+                   'columns': {'geometry': {'encoding': 'WKB', 'geometry_types': []}}}
+            schema = schema.with_metadata({'geo': json.dumps(geo)})
+            self._writer = pyarrow.parquet.ParquetWriter(path, schema)
+        elif file_format == 'arrow':
+            import pyarrow.ipc
+
+            self._writer = pyarrow.ipc.new_file(path, schema)
+        else:
+            raise ValueError('Unknown file format {}, expected parquet or arrow'.format(file_format))
+
+        self.schema = schema
+
+    def write(self, fids, geometries, result):
+
+        pa = self._pa
+        result = np.asarray(result, dtype=np.float64).reshape(-1, len(RESULT_FIELDS))
+
+        columns = [pa.array(np.asarray(fids, dtype=np.int64)),
+                   pa.array([bytes(geom.ExportToWkb()) for geom in geometries], type=pa.binary())]
+        columns += [pa.array(result[:, k]) for k in range(len(RESULT_FIELDS))]
+
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+
+        self._writer.close()
+
+
+class NumpyWriter:
+
+    """
+    Saves result rows as (N, 9) float64 matrix [fid, p, m1..m7] in .npy format.
+    Rows are appended to a temporary raw file chunk by chunk, the .npy header is written on close,
+    so memory use does not depend on the number of rows
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self._raw_path = path + '.part'
+        self._raw = open(self._raw_path, 'wb')
+        self._rows = 0
+
+    def write(self, fids, geometries, result):
+
+        rows = np.column_stack((np.asarray(fids, dtype=np.float64),
+                                np.asarray(result, dtype=np.float64).reshape(-1, len(RESULT_FIELDS))))
+        self._raw.write(rows.astype('<f8').tobytes())
+        self._raw.flush()
+        self._rows += len(rows)
+
+    def close(self):
+
+        self._raw.close()
+
+        with open(self.path, 'wb') as output, open(self._raw_path, 'rb') as raw:
+            np.lib.format.write_array_header_1_0(output, {'descr': '<f8', 'fortran_order': False,
+                                                          'shape': (self._rows, len(RESULT_FIELDS) + 1)})
+            shutil.copyfileobj(raw, output)
+
+        os.remove(self._raw_path)
+
+
+def open_writer(path):
+
+    """
+    Picks writer by extension of path: .shp, .gpkg, .parquet, .arrow/.feather, .npy
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in DRIVERS:
+        return OgrWriter(path, DRIVERS[extension])
+    if extension == '.parquet':
+        return ArrowWriter(path, 'parquet')
+    if extension in ('.arrow', '.feather'):
+        return ArrowWriter(path, 'arrow')
+    if extension == '.npy':
+        return NumpyWriter(path)
+
+    raise ValueError('Unsupported output format {}'.format(extension))
+
+
+def write_valid(writer, fids, geometries, result):
+
+    """
+    Writes rows with finite results only, degenerate geometries are skipped
+    :return: number of written features
+    """
+
+    result = np.asarray(result)
+    valid = np.isfinite(result).all(axis=1) if len(result) else np.zeros(0, dtype=bool)
+    indexes = np.flatnonzero(valid)
+
+    if len(indexes):
+        writer.write(np.asarray(fids)[indexes], [geometries[k] for k in indexes], result[indexes])
+
+    return len(indexes)
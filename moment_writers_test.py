@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import ogr
+from moment_writers import RESULT_FIELDS, OgrWriter, NumpyWriter, open_writer, write_valid
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class MomentWritersTest(unittest.TestCase):
+
+    def setUp(self):
+
+        wkts = ['POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0))',
+                'POLYGON((0 0, 1 0, 1 1, 0 0))',
+                'MULTIPOLYGON(((0 0, 4 0, 4 4, 0 0)), ((10 10, 12 10, 12 13, 10 10)))']
+
+        self.fids = np.array([7, 3, 12], dtype=np.int64)
+        self.geometries = [ogr.CreateGeometryFromWkt(wkt) for wkt in wkts]
+        self.result = np.arange(24, dtype=np.float64).reshape(3, 8)
+        self.result[1, 4] = np.nan
+
+    def test_numpy_writer(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            path = os.path.join(tmp_dir, 'result.npy')
+            writer = open_writer(path)
+            self.assertIsInstance(writer, NumpyWriter)
+
+            self.assertEqual(write_valid(writer, self.fids, self.geometries, self.result), 2)
+            self.assertEqual(write_valid(writer, self.fids[:1], self.geometries[:1], self.result[:1]), 1)
+
+            # rows go to disk chunk by chunk, not to memory
+            self.assertEqual(os.path.getsize(path + '.part'), 3 * (len(RESULT_FIELDS) + 1) * 8)
+            writer.close()
+
+            self.assertEqual(os.listdir(tmp_dir), ['result.npy'])
+            matrix = np.load(path)
+
+            empty_path = os.path.join(tmp_dir, 'empty.npy')
+            open_writer(empty_path).close()
+            self.assertEqual(np.load(empty_path).shape, (0, len(RESULT_FIELDS) + 1))
+
+        self.assertEqual(matrix.shape, (3, len(RESULT_FIELDS) + 1))
+        np.testing.assert_array_equal(matrix[:, 0], [7, 12, 7])
+        np.testing.assert_array_equal(matrix[:, 1:], self.result[[0, 2, 0]])
+
+    def test_geopackage_writer(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            path = os.path.join(tmp_dir, 'result.gpkg')
+            writer = open_writer(path)
+            self.assertIsInstance(writer, OgrWriter)
+
+            write_valid(writer, self.fids, self.geometries, self.result)
+            writer.close()
+
+            ds = ogr.Open(path, 0)
+            rows = {feature.GetFID(): [feature.GetField(name) for name in RESULT_FIELDS] for feature in ds.GetLayer()}
+            ds = None
+
+        self.assertEqual(rows, {7: self.result[0].tolist(), 12: self.result[2].tolist()})
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet_writer(self):
+
+        import pyarrow.parquet
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            path = os.path.join(tmp_dir, 'result.parquet')
+            writer = open_writer(path)
+            write_valid(writer, self.fids, self.geometries, self.result)
+            writer.close()
+
+            table = pyarrow.parquet.read_table(path)
+
+        self.assertEqual(table.column('fid').to_pylist(), [7, 12])
+        self.assertEqual(table.column('m7').to_pylist(), self.result[[0, 2], 7].tolist())
+        self.assertEqual(table.column('geometry').to_pylist()[1], bytes(self.geometries[2].ExportToWkb()))
+
+    def test_unknown_format(self):
+
+        with self.assertRaises(ValueError):
+            open_writer('result.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,50 @@
 import math
-from collections import defaultdict
-from scipy.special import binom
-from contracts import contract
+import numpy as np
+from contract_mode import strict_contract
+
+# max power accepted by add_member and binomial_theorem
+MAX_POWER = 10
+
+# Pascal triangle, BINOMIALS[n, k] = binom(n, k), zero for k > n
+BINOMIALS = np.array([[math.comb(n, k) for k in range(MAX_POWER + 1)] for n in range(MAX_POWER + 1)], dtype=np.float64)
+
+# RECIPROCALS[k] = 1 / (k + 1), integration factors of x^k; products of two members reach 2 * MAX_POWER
+RECIPROCALS = 1.0 / np.arange(1, 2 * MAX_POWER + 2, dtype=np.float64)
+
+
+def _reciprocals(count):
+
+    """
+    Returns integration factors 1 / (k + 1) for k < count
+    """
+
+    if count <= len(RECIPROCALS):
+        return RECIPROCALS[:count]
+
+    return 1.0 / np.arange(1, count + 1, dtype=np.float64)
 
 
 class Polynome:
 
+    """
+    Polynomial of x and y stored as dense coefficient array, _coefs[pow_x, pow_y] is coefficient of x^pow_x * y^pow_y
+    """
+
     def __init__(self):
 
-        self._members = defaultdict(float)
+        self._coefs = np.zeros((1, 1))
 
-    @contract
+    @strict_contract
     def add_member(self, coef: 'float|int', pow_x: 'int,>=0,<=10', pow_y: 'int,>=0,<=10'):
 
-        self._members[(int(pow_x), int(pow_y))] += coef
+        pow_x, pow_y = int(pow_x), int(pow_y)
+
+        if pow_x >= self._coefs.shape[0] or pow_y >= self._coefs.shape[1]:
+            coefs = np.zeros((max(pow_x + 1, self._coefs.shape[0]), max(pow_y + 1, self._coefs.shape[1])))
+            coefs[:self._coefs.shape[0], :self._coefs.shape[1]] = self._coefs
+            self._coefs = coefs
+
+        self._coefs[pow_x, pow_y] += coef
 
         return self
 
@@ -22,26 +53,31 @@ class Polynome:
         if not isinstance(other, Polynome):
             raise TypeError
 
-        result = Polynome()
+        a, b = self._coefs, other._coefs
 
-        for (pow_x1, pow_y1), coef1 in self._members.items():
+        # 2d convolution as one 1d convolution: rows are padded to the result width,
+        # so member (pow_x, pow_y) sits at pow_x * width + pow_y and sums of powers never wrap
+        shape = (a.shape[0] + b.shape[0] - 1, a.shape[1] + b.shape[1] - 1)
 
-            for (pow_x2, pow_y2), coef2 in other._members.items():
+        a_flat = np.zeros((a.shape[0], shape[1]))
+        a_flat[:, :a.shape[1]] = a
+        b_flat = np.zeros((b.shape[0], shape[1]))
+        b_flat[:, :b.shape[1]] = b
 
-                result._members[(pow_x1 + pow_x2, pow_y1 + pow_y2)] += coef1 * coef2
+        result = Polynome()
+        result._coefs = np.convolve(a_flat.ravel(), b_flat.ravel())[:shape[0] * shape[1]].reshape(shape)
 
         return result
 
     def compute(self, x_value, y_value):
 
-        if not len(self._members):
+        x_powers = float(x_value) ** np.arange(self._coefs.shape[0], dtype=np.float64)
+        y_powers = float(y_value) ** np.arange(self._coefs.shape[1], dtype=np.float64)
 
-            return 0
-
-        return sum(((x_value ** pow_x) * (y_value ** pow_y) * coef for (pow_x, pow_y), coef in self._members.items()))
+        return float(x_powers @ self._coefs @ y_powers)
 
     @classmethod
-    @contract
+    @strict_contract
     def binomial_theorem(cls, x_coef: 'float|int', y_coef: 'float|int', power: 'int,>=0,<=10'):
 
         """
@@ -49,25 +85,34 @@ class Polynome:
         """
 
         instance = cls()
-        n = power
-        instance._members = defaultdict(
-            float, {(n - i, i): binom(n, n - i) * x_coef ** (n - i) * y_coef**i for i in range(n + 1)})
+        n = int(power)
+        k = np.arange(n + 1)
+
+        instance._coefs = np.zeros((n + 1, n + 1))
+        instance._coefs[n - k, k] = BINOMIALS[n, :n + 1] * float(x_coef) ** (n - k) * float(y_coef) ** k
 
         return instance
 
     def integral_x(self):
 
-        instance = Polynome()
+        pow_x_count = self._coefs.shape[0]
 
-        instance._members = defaultdict(
-            float, {(pow_x + 1, pow_y): 1.0 / (pow_x + 1.0) * k for (pow_x, pow_y), k in self._members.items()})
+        instance = Polynome()
+        instance._coefs = np.zeros((pow_x_count + 1, self._coefs.shape[1]))
+        instance._coefs[1:] = self._coefs * _reciprocals(pow_x_count)[:, None]
 
         return instance
 
     def compute_integral_x(self, x_begin, x_end, y_value):
 
-        integral = self.integral_x()
-        return integral.compute(x_value=x_end, y_value=y_value) - integral.compute(x_value=x_begin, y_value=y_value)
+        # sum(coef * (x_end^(pow_x+1) - x_begin^(pow_x+1)) / (pow_x + 1) * y^pow_y) without building the integral
+        pow_x_count, pow_y_count = self._coefs.shape
+        powers = np.arange(1, pow_x_count + 1, dtype=np.float64)
+
+        x_terms = (float(x_end) ** powers - float(x_begin) ** powers) * _reciprocals(pow_x_count)
+        y_powers = float(y_value) ** np.arange(pow_y_count, dtype=np.float64)
+
+        return float(x_terms @ self._coefs @ y_powers)
 
 
 if __name__ == '__main__':
@@ -80,13 +125,13 @@ if __name__ == '__main__':
 
     x, y = 1, 3
 
-    assert polynome_1.compute(x, y) == 6 * x**2 * y**2 - 0.5 * x**0 * y**3 + 7.6 * x**4 * y**0
+    assert math.isclose(polynome_1.compute(x, y), 6 * x**2 * y**2 - 0.5 * x**0 * y**3 + 7.6 * x**4 * y**0)
 
-    assert polynome_2.compute(x, y) == 7.8 * x**4 * y**1 - 0.1 * x**5 * y **2 + 32 * x**3 * y**1
+    assert math.isclose(polynome_2.compute(x, y), 7.8 * x**4 * y**1 - 0.1 * x**5 * y **2 + 32 * x**3 * y**1)
 
-    assert (polynome_1 * polynome_2).compute(x, y) == \
-           (6 * x**2 * y**2 - 0.5 * x**0 * y**3 + 7.6 * x**4 * y**0) * \
-           (7.8 * x**4 * y**1 - 0.1 * x**5 * y **2 + 32 * x**3 * y**1)
+    assert math.isclose((polynome_1 * polynome_2).compute(x, y),
+                        (6 * x**2 * y**2 - 0.5 * x**0 * y**3 + 7.6 * x**4 * y**0) *
+                        (7.8 * x**4 * y**1 - 0.1 * x**5 * y **2 + 32 * x**3 * y**1))
 
     polynome_3 = Polynome.binomial_theorem(x_coef=1.1, y_coef=2, power=2)
 
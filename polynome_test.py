@@ -78,17 +78,40 @@ class PolynomeTest(unittest.TestCase):
 
     def test_binomial_theorem(self):
 
-        pass
-        # polynome_3 = Polynome.binomial_theorem(x_coef=1.1, y_coef=2, power=2)
-        #
-        # def near(val, ref_val, diff=1e-6):
-        #
-        #     return abs(val - ref_val) < abs(ref_val * diff)
-        #
-        # assert near(polynome_3.compute(x, y), (1.1 * x + 2 * y)**2)
+        test_values = [
+            (1.2, 34),
+            (-17, 0.1),
+            (123.6, -7.9)
+        ]
+
+        for power in range(11):
+
+            polynome = Polynome.binomial_theorem(x_coef=1.1, y_coef=-2, power=power)
+
+            for x, y in test_values:
+
+                with self.subTest(power=power, x=x, y=y):
+
+                    self.assertTrue(math.isclose(polynome.compute(x, y), (1.1 * x - 2 * y) ** power, rel_tol=1e-9))
 
     def test_integral_x(self):
-        pass
+
+        polynome = Polynome().add_member(4.7, 7, 0).add_member(3.3, 1, 2).add_member(-0.5, 0, 3)
+
+        def primitive(x, y):
+
+            return 4.7 * x**8 / 8.0 + 3.3 * x**2 / 2.0 * y**2 - 0.5 * x * y**3
+
+        for x_begin, x_end, y in ((56.6, 100.3, 11.2), (-1.5, 2.0, -3.0), (0, 0, 5)):
+
+            with self.subTest(x_begin=x_begin, x_end=x_end, y=y):
+
+                reference = primitive(x_end, y) - primitive(x_begin, y)
+
+                self.assertTrue(math.isclose(polynome.compute_integral_x(x_begin=x_begin, x_end=x_end, y_value=y),
+                                             reference, rel_tol=1e-9))
+                self.assertTrue(math.isclose(polynome.integral_x().compute(x_end, y) -
+                                             polynome.integral_x().compute(x_begin, y), reference, rel_tol=1e-9))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,166 @@
+"""
+Shape similarity search over hu-moments.
+
+Hu-moments of real shapes span many orders of magnitude, so every invariant is log-scaled
+(-sign(h) * log10(|h|), as OpenCV matchShapes does) before it goes to a KD-tree.
+Optionally the scaled vectors are quantized to 8 or 16 bits per invariant, it cuts the size
+of the saved index, the tree is built over the dequantized vectors.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+from moment_batch import compute_hu_batch
+from wkb_reader import pack_wkb
+
+# absolute values of hu-moments are clipped to it: invariants that vanish for symmetric shapes
+# come out as rounding noise up to ~1e-28, the floor maps them all to the same finite value
+LOG_FLOOR = 1e-20
+
+QUANTIZATION_BITS = (8, 16)
+
+
+def log_scale(hu):
+
+    """
+    :param hu: (..., 7) array of hu-moments
+    :return: (..., 7) array of -sign(h) * log10(|h|), values below LOG_FLOOR lose their sign
+    """
+
+    hu = np.asarray(hu, dtype=np.float64)
+    return -np.where(hu < -LOG_FLOOR, -1.0, 1.0) * np.log10(np.maximum(np.abs(hu), LOG_FLOOR))
+
+
+class ShapeIndex:
+
+    """
+    KD-tree over log-scaled hu-moment vectors of features
+    :param fids: (N,) int array of feature ids
+    :param hu: (N, 7) array of hu-moments, rows with non-finite values are skipped
+    :param bits: None, 8 or 16 - quantization of the stored vectors
+    """
+
+    def __init__(self, fids, hu, bits=None):
+
+        if bits is not None and bits not in QUANTIZATION_BITS:
+            raise ValueError('Quantization bits must be one of {}, got {}'.format(QUANTIZATION_BITS, bits))
+
+        hu = np.asarray(hu, dtype=np.float64).reshape(-1, 7)
+        valid = np.isfinite(hu).all(axis=1)
+
+        self.fids = np.asarray(fids, dtype=np.int64)[valid]
+        self.bits = bits
+
+        vectors = log_scale(hu[valid])
+
+        if bits is None:
+            self._init_tree(vectors)
+            return
+
+        if len(vectors):
+            self._low = vectors.min(axis=0)
+            self._step = (vectors.max(axis=0) - self._low) / (2 ** bits - 1)
+            self._step[self._step == 0] = 1.0
+        else:
+            self._low = np.zeros(7)
+            self._step = np.ones(7)
+
+        dtype = np.uint8 if bits == 8 else np.uint16
+        self._codes = np.rint((vectors - self._low) / self._step).astype(dtype)
+        self._init_tree(self._low + self._codes * self._step)
+
+    def _init_tree(self, vectors):
+
+        self.vectors = vectors
+        self._tree = cKDTree(vectors)
+
+    def __len__(self):
+        return len(self.fids)
+
+    @classmethod
+    def from_wkb(cls, fids, wkbs, bits=None):
+
+        """
+        Builds index of WKB Polygons and MultiPolygons
+        """
+
+        return cls(fids, compute_hu_batch(*pack_wkb(wkbs)), bits=bits)
+
+    @classmethod
+    def from_result_matrix(cls, matrix, bits=None):
+
+        """
+        Builds index from the (N, 9) [fid, p, m1..m7] matrix written by moment_writers.NumpyWriter
+        """
+
+        matrix = np.asarray(matrix)
+        return cls(matrix[:, 0].astype(np.int64), matrix[:, 2:], bits=bits)
+
+    def query(self, hu, k=10):
+
+        """
+        Finds k features of the most similar shape
+        :param hu: (7,) or (M, 7) array of hu-moments
+        :return: distances, fids - (k,) or (M, k) arrays, nearest first
+        """
+
+        hu = np.asarray(hu, dtype=np.float64)
+        k = min(k, len(self))
+
+        if k == 0:
+            empty = np.empty(hu.shape[:-1] + (0,))
+            return empty, empty.astype(np.int64)
+
+        distances, indexes = self._tree.query(log_scale(hu), k=k)
+
+        if k == 1:
+            distances = distances[..., None]
+            indexes = indexes[..., None]
+
+        return distances, self.fids[indexes]
+
+    def query_wkb(self, wkb, k=10):
+
+        """
+        Finds k features of the shape most similar to the WKB Polygon or MultiPolygon
+        :return: distances, fids - (k,) arrays
+        """
+
+        return self.query(compute_hu_batch(*pack_wkb([wkb]))[0], k=k)
+
+    def query_geometry(self, geom, k=10):
+
+        """
+        :param geom: ogr.Geometry(Polygon|MultiPolygon)
+        """
+
+        return self.query_wkb(geom.ExportToWkb(), k=k)
+
+    def save(self, path):
+
+        """
+        Saves index to .npz file, quantized indexes store codes only
+        """
+
+        if self.bits is None:
+            np.savez(path, fids=self.fids, vectors=self.vectors)
+        else:
+            np.savez(path, fids=self.fids, codes=self._codes, low=self._low, step=self._step, bits=self.bits)
+
+    @classmethod
+    def load(cls, path):
+
+        with np.load(path) as data:
+
+            instance = cls.__new__(cls)
+            instance.fids = data['fids']
+
+            if 'vectors' in data:
+                instance.bits = None
+                instance._init_tree(data['vectors'])
+            else:
+                instance.bits = int(data['bits'])
+                instance._codes = data['codes']
+                instance._low = data['low']
+                instance._step = data['step']
+                instance._init_tree(instance._low + instance._codes * instance._step)
+
+        return instance
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from moment_batch import pack_polygons, compute_hu_batch
+from shape_index import ShapeIndex, log_scale
+
+
+def regular_polygon(count, center=(0.0, 0.0), radius=1.0, angle=0.0, stretch=1.0):
+
+    t = 2 * np.pi * np.arange(count + 1) / count
+    x, y = radius * stretch * np.cos(t), radius * np.sin(t)
+    cos, sin = np.cos(angle), np.sin(angle)
+    return np.column_stack((center[0] + cos * x - sin * y, center[1] + sin * x + cos * y))
+
+
+class ShapeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+
+        # ten families of shapes, every family is randomly moved, rotated and scaled
+        polygons = []
+        for n in range(200):
+            count, stretch = 3 + n % 5, 1.0 + n % 10 // 5
+            polygons.append([regular_polygon(count, center=rng.uniform(-1e4, 1e4, 2), radius=rng.uniform(1, 100),
+                                             angle=rng.uniform(0, 2 * np.pi), stretch=stretch)])
+
+        self.families = np.arange(200) % 10
+        self.fids = np.arange(200) * 3
+        self.hu = compute_hu_batch(*pack_polygons(polygons))
+
+    def assertSameFamily(self, index):
+
+        query = compute_hu_batch(*pack_polygons([[regular_polygon(4, radius=7, angle=0.3, stretch=2.0)]]))[0]
+        distances, fids = index.query(query, k=5)
+
+        self.assertEqual(fids.shape, (5,))
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+        self.assertTrue(np.all(self.families[fids // 3] == 6))
+
+    def test_query(self):
+
+        index = ShapeIndex(self.fids, self.hu)
+
+        self.assertEqual(len(index), 200)
+        self.assertSameFamily(index)
+
+        distances, fids = index.query(self.hu[:3], k=1)
+        self.assertEqual(fids.shape, (3, 1))
+        np.testing.assert_array_equal(fids[:, 0] // 3 % 10, [0, 1, 2])
+
+    def test_quantized(self):
+
+        for bits in (8, 16):
+            with self.subTest(bits=bits):
+                self.assertSameFamily(ShapeIndex(self.fids, self.hu, bits=bits))
+
+        with self.assertRaises(ValueError):
+            ShapeIndex(self.fids, self.hu, bits=4)
+
+    def test_query_wkb(self):
+
+        index = ShapeIndex(self.fids, self.hu)
+        ring = regular_polygon(5, center=(3, 4), radius=2)
+        wkb = b'\x01' + np.array([3, 1, len(ring)], dtype='<u4').tobytes() + ring.astype('<f8').tobytes()
+
+        distances, fids = index.query_wkb(wkb, k=3)
+        self.assertTrue(np.all(fids // 3 % 10 == 2))
+
+    def test_save_load(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            for bits in (None, 8):
+
+                path = os.path.join(tmp_dir, 'index_{}.npz'.format(bits))
+                index = ShapeIndex(self.fids, self.hu, bits=bits)
+                index.save(path)
+                loaded = ShapeIndex.load(path)
+
+                with self.subTest(bits=bits):
+                    self.assertEqual(loaded.bits, bits)
+                    np.testing.assert_array_equal(loaded.vectors, index.vectors)
+                    np.testing.assert_array_equal(loaded.query(self.hu[7], k=4)[1], index.query(self.hu[7], k=4)[1])
+
+    def test_invalid_rows(self):
+
+        hu = self.hu.copy()
+        hu[5] = np.nan
+        index = ShapeIndex(self.fids, hu)
+
+        self.assertEqual(len(index), 199)
+        self.assertNotIn(15, index.fids)
+        self.assertEqual(log_scale([-0.01, 0.0, 100.0]).tolist(), [-2.0, 20.0, -2.0])
+
+    def test_rotated_asymmetric(self):
+
+        # L-shape with unequal arms and a notch, none of its invariants vanishes
+        shape = np.array([[0.0, 0.0], [6.0, 0.0], [6.0, 1.0], [2.0, 1.0], [2.0, 2.5], [1.5, 2.5], [1.5, 4.0],
+                          [0.0, 4.0], [0.0, 0.0]])
+        thicker = shape.copy()
+        thicker[[2, 3], 1] = 1.3
+
+        polygons = []
+        for angle in (0.0, 30.0, 77.0, 200.0):
+            cos, sin = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+            polygons.append([shape @ [[cos, sin], [-sin, cos]] + [angle * 10, -angle]])
+        polygons.append([thicker])
+
+        hu = compute_hu_batch(*pack_polygons(polygons))
+        index = ShapeIndex(np.arange(5), hu)
+
+        distances, fids = index.query(hu[0], k=5)
+
+        self.assertEqual(sorted(fids[:4].tolist()), [0, 1, 2, 3])
+        self.assertEqual(fids[4], 4)
+        self.assertLess(distances[3], 1e-6)
+        self.assertGreater(distances[4], 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
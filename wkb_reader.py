@@ -0,0 +1,143 @@
+import struct
+import numpy as np
+from moment_batch import pack_polygons
+
+WKB_POLYGON = 3
+WKB_MULTIPOLYGON = 6
+
+# flags of 2.5D geometry types written by OGR (wkbVariantOldOgc) and of PostGIS EWKB
+_WKB_25D_FLAG = 0x80000000
+_WKB_M_FLAG = 0x40000000
+_WKB_SRID_FLAG = 0x20000000
+
+
+def _read_header(data, offset):
+
+    """
+    Reads byte order and geometry type
+    :return: byte order prefix for struct/numpy, base geometry type, coordinate dimension, offset after header
+    """
+
+    order = '<' if data[offset] == 1 else '>'
+    geom_type, = struct.unpack_from(order + 'I', data, offset + 1)
+    offset += 5
+
+    dims = 2
+
+    if geom_type & _WKB_25D_FLAG:
+        dims += 1
+    if geom_type & _WKB_M_FLAG:
+        dims += 1
+    if geom_type & _WKB_SRID_FLAG:
+        offset += 4
+
+    geom_type &= 0x0fffffff
+
+    # ISO WKB: 1000 - Z, 2000 - M, 3000 - ZM
+    iso, geom_type = divmod(geom_type, 1000)
+    dims += {0: 0, 1: 1, 2: 1, 3: 2}[iso]
+
+    return order, geom_type, dims, offset
+
+
+def _read_polygon_body(data, offset, order, dims):
+
+    """
+    Reads rings of polygon, coordinates are numpy views of data, z and m are dropped
+    :return: list of (N, 2) arrays, offset after polygon
+    """
+
+    ring_count, = struct.unpack_from(order + 'I', data, offset)
+    offset += 4
+
+    dtype = np.dtype(order + 'f8')
+    rings = []
+
+    for _ in range(ring_count):
+
+        point_count, = struct.unpack_from(order + 'I', data, offset)
+        offset += 4
+
+        points = np.frombuffer(data, dtype=dtype, count=point_count * dims, offset=offset)
+        rings.append(points.reshape(point_count, dims)[:, :2])
+
+        offset += point_count * dims * 8
+
+    return rings, offset
+
+
+def read_wkb(data):
+
+    """
+    Parses WKB Polygon or MultiPolygon without creating per-vertex python objects
+    :param data: bytes or bytearray
+    :return: list of polygons, every polygon is a list of (N, 2) arrays of ring vertices
+    """
+
+    data = memoryview(data).cast('B')
+    order, geom_type, dims, offset = _read_header(data, 0)
+
+    if geom_type == WKB_POLYGON:
+        rings, _ = _read_polygon_body(data, offset, order, dims)
+        return [rings]
+
+    if geom_type == WKB_MULTIPOLYGON:
+
+        part_count, = struct.unpack_from(order + 'I', data, offset)
+        offset += 4
+
+        polygons = []
+
+        for _ in range(part_count):
+
+            part_order, part_type, part_dims, offset = _read_header(data, offset)
+
+            if part_type != WKB_POLYGON:
+                raise ValueError('MultiPolygon part must be a Polygon, got WKB type {}'.format(part_type))
+
+            rings, offset = _read_polygon_body(data, offset, part_order, part_dims)
+            polygons.append(rings)
+
+        return polygons
+
+    raise ValueError('Geometry type must be Polygon or MultiPolygon, got WKB type {}'.format(geom_type))
+
+
+def pack_wkb(wkbs):
+
+    """
+    Packs WKB geometries into the ragged layout of moment_batch, one entry per geometry:
+    rings of all parts of a MultiPolygon go to the same entry, so their moments are summed
+    :param wkbs: iterable of WKB Polygons or MultiPolygons
+    :return: coords, ring_offsets, poly_offsets
+    """
+
+    return pack_polygons([[ring for polygon in read_wkb(data) for ring in polygon] for data in wkbs])
+
+
+def vertex_count(wkbs):
+
+    """
+    Counts vertices of WKB geometries without packing them, rings are read as views
+    :param wkbs: iterable of WKB Polygons or MultiPolygons
+    :rtype: int
+    """
+
+    return sum(len(ring) for data in wkbs for polygon in read_wkb(data) for ring in polygon)
+
+
+def pack_wkb_parts(wkbs):
+
+    """
+    Packs WKB geometries into the MultiPolygon layout of moment_batch: every part is a polygon entry,
+    geom_offsets group the parts by geometry, first ring of every part stays its exterior ring
+    :param wkbs: iterable of WKB Polygons or MultiPolygons
+    :return: coords, ring_offsets, poly_offsets, geom_offsets
+    """
+
+    geometries = [read_wkb(data) for data in wkbs]
+
+    geom_offsets = np.zeros(len(geometries) + 1, dtype=np.int64)
+    geom_offsets[1:] = np.cumsum([len(polygons) for polygons in geometries])
+
+    return (*pack_polygons([polygon for polygons in geometries for polygon in polygons]), geom_offsets)
@@ -0,0 +1,100 @@
+import struct
+import unittest
+import numpy as np
+import ogr
+from gdal_helper import geometry_rings
+from moment import Moment
+from wkb_reader import read_wkb, pack_wkb, pack_wkb_parts, vertex_count
+
+
+def _polygon_wkb(rings, order='<', geom_type=3, dims=2):
+
+    data = struct.pack(order + 'BII', 1 if order == '<' else 0, geom_type, len(rings))
+
+    for ring in rings:
+        points = np.column_stack([ring] + [np.full(len(ring), 7.0)] * (dims - 2))
+        data += struct.pack(order + 'I', len(ring)) + points.astype(order + 'f8').tobytes()
+
+    return data
+
+
+class WkbReaderTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rings = [np.array([[-2.0, -2.0], [2.0, -2.0], [2.0, 2.0], [-2.0, 2.0], [-2.0, -2.0]]),
+                      np.array([[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0], [-1.0, 1.0], [-1.0, -1.0]])]
+
+    def test_byte_order_and_dimensions(self):
+
+        variants = [('<', 3, 2), ('>', 3, 2), ('<', 0x80000003, 3), ('>', 1003, 3), ('<', 2003, 3), ('<', 3003, 4)]
+
+        for order, geom_type, dims in variants:
+
+            with self.subTest(order=order, geom_type=geom_type):
+
+                polygons = read_wkb(_polygon_wkb(self.rings, order, geom_type, dims))
+
+                self.assertEqual(len(polygons), 1)
+                self.assertEqual(len(polygons[0]), 2)
+
+                for ring, reference in zip(polygons[0], self.rings):
+                    np.testing.assert_array_equal(ring, reference)
+
+    def test_multipolygon(self):
+
+        data = struct.pack('<BII', 1, 6, 2) + _polygon_wkb(self.rings[:1]) + _polygon_wkb(self.rings[1:], '>')
+
+        polygons = read_wkb(data)
+
+        self.assertEqual(len(polygons), 2)
+        np.testing.assert_array_equal(polygons[1][0], self.rings[1])
+
+    def test_invalid_type(self):
+
+        with self.assertRaises(ValueError):
+            read_wkb(struct.pack('<BIdd', 1, 1, 0.0, 0.0))
+
+    def test_ogr_geometry(self):
+
+        geom = ogr.CreateGeometryFromWkt('POLYGON((0 0, 5 1, 6 4, 2 7, -1 3, 0 0), (1 1, 2 1, 2 2, 1 1))')
+
+        for ring, reference in zip(read_wkb(geom.ExportToWkb())[0], geometry_rings(geom)):
+            np.testing.assert_array_equal(ring, reference)
+
+        m1 = Moment(geom)
+        m2 = Moment.from_wkb(geom.ExportToWkb())
+
+        self.assertIsNone(m2.geom)
+        self.assertEqual(m1.compute_hu_all(), m2.compute_hu_all())
+        self.assertEqual(len(Moment.from_wkb_batch([geom.ExportToWkb()] * 3)), 3)
+
+    def test_pack_wkb(self):
+
+        multipolygon = struct.pack('<BII', 1, 6, 2) + _polygon_wkb(self.rings[:1]) + _polygon_wkb(self.rings[1:])
+
+        coords, ring_offsets, poly_offsets = pack_wkb([_polygon_wkb(self.rings), _polygon_wkb(self.rings[:1], '>'),
+                                                       multipolygon])
+
+        self.assertEqual(coords.shape, (25, 2))
+        self.assertEqual(list(ring_offsets), [0, 5, 10, 15, 20, 25])
+        self.assertEqual(list(poly_offsets), [0, 2, 3, 5])
+        self.assertEqual(vertex_count([_polygon_wkb(self.rings), _polygon_wkb(self.rings[:1], '>'), multipolygon]),
+                         len(coords))
+
+
+    def test_pack_wkb_parts(self):
+
+        multipolygon = struct.pack('<BII', 1, 6, 2) + _polygon_wkb(self.rings[:1]) + _polygon_wkb(self.rings[1:])
+
+        coords, ring_offsets, poly_offsets, geom_offsets = pack_wkb_parts([_polygon_wkb(self.rings), multipolygon])
+
+        self.assertEqual(coords.shape, (20, 2))
+        self.assertEqual(list(ring_offsets), [0, 5, 10, 15, 20])
+        self.assertEqual(list(poly_offsets), [0, 2, 3, 4])
+        self.assertEqual(list(geom_offsets), [0, 1, 3])
+
+
+if __name__ == '__main__':
+
+    unittest.main()